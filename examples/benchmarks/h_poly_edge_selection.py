@@ -0,0 +1,61 @@
+"""BENCHMARK
+
+Compare the edge-selection strategies for deletion-contraction in h_poly.
+
+For every strategy, the H polynomials of a set of test graphs are computed with and without a cache, and the number of
+deletion-contractions, the cache hit rate, and the run time are reported. The test graphs are the projection graphs
+of the resolution states of some enumerated spatial topologies, together with random 3- and 4-regular graphs whose
+2-connected cores are much larger.
+
+"""
+# %% Import Statements
+
+import os
+import glob
+import itertools
+import time
+import numpy as np
+import networkx as nx
+from yamada import extract_graph_from_json_file, SpatialGraph
+from yamada.caches import HPolyCache
+from yamada.H_polynomial import h_poly, EDGE_SELECTION_STRATEGIES
+from yamada.state_sums import iter_resolution_states
+
+# %% Collect the test graphs
+
+# Set the random seed for reproducibility
+np.random.seed(0)
+
+directory = os.path.dirname(__file__) + '/'
+filepaths = sorted(glob.glob(directory + '../calculate_yamada_polynomials/enumerated_spatial_topologies/G*/C3/*.json'))
+
+graphs = []
+for filepath in filepaths[:10]:
+    nodes, node_positions, edges = extract_graph_from_json_file(filepath)
+    node_positions = {node: position for node, position in zip(nodes, node_positions)}
+    try:
+        sgd = SpatialGraph(nodes=nodes, node_positions=node_positions, edges=edges).create_spatial_graph_diagram()
+    except RuntimeError:
+        # Some projections of the stored positions are degenerate
+        continue
+    for _, graph in itertools.islice(iter_resolution_states(sgd), 100):
+        graphs.append(graph.copy())
+
+graphs += [nx.MultiGraph(nx.random_regular_graph(3, n, seed=seed)) for n in (10, 14, 18) for seed in range(3)]
+graphs += [nx.MultiGraph(nx.random_regular_graph(4, n, seed=seed)) for n in (8, 10) for seed in range(3)]
+
+print('Test graphs:', len(graphs))
+
+# %% Compare the strategies
+
+for name in EDGE_SELECTION_STRATEGIES:
+    for cache in [None, HPolyCache()]:
+        stats = {}
+        start = time.perf_counter()
+        for graph in graphs:
+            h_poly(graph, cache=cache, edge_selection=name, stats=stats)
+        elapsed = time.perf_counter() - start
+
+        hit_rate = 'no cache' if cache is None else 'hit rate %.2f' % (cache.hits / max(cache.hits + cache.misses, 1))
+        print('%-12s %-14s deletion-contractions %6d  block splits %4d  %6.2f s' %
+              (name, hit_rate, stats['deletion_contractions'], stats['block_splits'], elapsed))
@@ -13,11 +13,36 @@ P4. If G has a cut edge, then H(G) =  0
 P5. Let e be a non-loop edge of graph G. Then H(G) = H(G/e) + H(G-e) where G/e is the graph obtained from G by
     contracting e to a point and G-e is G with e deleted.
 
+Together these give the subgraph expansion
+
+    H(G) = sum over subsets F of the edges of (-1)^k(F) b^mu(F),    b = -(A + 2 + A^(-1))
+
+where k(F) and mu(F) are the number of components and the number of independent cycles of the spanning subgraph with
+edges F. Weighting each edge e by a pair (alpha_e, beta_e), a factor of the terms where e is not or is in F, lets whole
+parallel bundles and series chains be replaced by single edges in closed form:
+
+    parallel edges:  (alpha_1 alpha_2,                        beta_1 alpha_2 + alpha_1 beta_2 + b beta_1 beta_2)
+    series edges:    (beta_1 alpha_2 + alpha_1 beta_2 - alpha_1 alpha_2,  beta_1 beta_2)
+
+while a loop contributes a factor alpha + b beta, a pendant edge a factor beta - alpha, and P5 becomes
+H(G) = alpha_e H(G-e) + beta_e H(G/e). Unweighted edges have alpha = beta = 1.
+
 """
 
 import networkx as nx
 import collections
-from cypari import pari
+from yamada.caches import HPolyCache
+from yamada.laurent_polynomials import LaurentPolynomial
+
+
+# The H polynomial of a simple loop, A + 1 + A^(-1)
+LOOP_POLYNOMIAL = LaurentPolynomial([1, 1, 1], -1)
+
+# The factor b = -(A + 2 + A^(-1)) contributed by each independent cycle in the subgraph expansion of H
+CYCLE_FACTOR = LaurentPolynomial([-1, -2, -1], -1)
+
+_ONE = LaurentPolynomial([1])
+_ZERO = LaurentPolynomial([])
 
 
 def has_cut_edge(abstract_graph):
@@ -74,31 +99,515 @@ def remove_valence_two_vertices(graph):
     return G
 
 
-def graph_hash(graph):
+def _refine(colors, neighbors):
+
+    """
+    Refines a vertex coloring until vertices of the same color have the same number of edges to every color class.
+
+    Colors are integers assigned by sorting the signatures of the previous colors, so the result does not depend on
+    how the vertices are labelled.
+    """
+
+    num_colors = len(set(colors))
+
+    while True:
+        signatures = [(colors[v], tuple(sorted((colors[u], label, k) for (u, label), k in neighbors[v].items())))
+                      for v in range(len(colors))]
+        ranks = {signature: rank for rank, signature in enumerate(sorted(set(signatures)))}
+        colors = [ranks[signature] for signature in signatures]
+
+        if len(ranks) == num_colors:
+            return colors
+        num_colors = len(ranks)
+
+
+def _canonical_edges(colors, neighbors, edges):
+
+    """
+    Returns the lexicographically smallest edge list over all discrete refinements of the vertex coloring.
+
+    Two leaves of the search with the same edge list give an automorphism of the graph. Automorphisms that fix the
+    vertices individualized so far map subtrees onto each other, so only one vertex of each of their orbits in a cell
+    is explored.
+    """
+
+    leaves = {}
+    automorphisms = []
+
+    def search(colors, path):
+        colors = _refine(colors, neighbors)
+
+        cells = collections.defaultdict(list)
+        for v, color in enumerate(colors):
+            cells[color].append(v)
+
+        if len(cells) == len(colors):
+            code = tuple(sorted((min(colors[u], colors[v]), max(colors[u], colors[v])) + tuple(label)
+                                for u, v, *label in edges))
+            if code in leaves:
+                first = {color: v for v, color in enumerate(leaves[code])}
+                automorphisms.append([first[color] for color in colors])
+            else:
+                leaves[code] = colors
+            return code
+
+        # Individualize each vertex of the first smallest non-trivial cell in turn, up to automorphisms
+        cell = min((c for c in cells.values() if len(c) > 1), key=lambda c: (len(c), colors[c[0]]))
+        best = None
+        explored = set()
+        for v in cell:
+            if v in explored:
+                continue
+            individualized = [2 * color + (u != v) for u, color in enumerate(colors)]
+            code = search(individualized, path + [v])
+            if best is None or code < best:
+                best = code
+
+            explored.add(v)
+            stabilizer = [gamma for gamma in automorphisms if all(gamma[u] == u for u in path)]
+            stack = list(explored)
+            while stack:
+                u = stack.pop()
+                for gamma in stabilizer:
+                    if gamma[u] not in explored:
+                        explored.add(gamma[u])
+                        stack.append(gamma[u])
+
+        return best
+
+    return search(colors, [])
+
+
+def canonical_form(graph):
 
     """
-    Returns a hash of the graph.
+    Returns a canonical form of a (multi)graph, which may have parallel edges and loops.
 
-    The graph hash is used to cache the results of the H polynomial computation and avoid recomputing the H polynomial.
+    Two graphs have the same canonical form if and only if they are isomorphic. The form is a tuple of the number of
+    vertices and the sorted list of edges after relabelling the vertices 0, 1, ..., n-1, so it may be used directly
+    as a dictionary key. It is found by color refinement and individualization, which is fast for the small graphs
+    that arise when computing H polynomials.
     """
 
-    return nx.weisfeiler_lehman_graph_hash(graph, iterations=3)
+    index = {v: i for i, v in enumerate(graph.nodes())}
+    return _canonical_form(len(index), [(index[u], index[v]) for u, v in graph.edges()])
+
+
+def _canonical_form(num_vertices, edges):
+
+    """
+    Returns the canonical form of the graph with vertices 0, ..., num_vertices - 1 and the given edges. Edges are
+    tuples (u, v, *label) where the optional label, such as a weight, must be preserved by isomorphisms.
+    """
 
+    neighbors = [collections.Counter() for _ in range(num_vertices)]
+    for u, v, *label in edges:
+        label = tuple(label)
+        neighbors[u][v, label] += 1
+        if u != v:
+            neighbors[v][u, label] += 1
 
-H_poly_cache = collections.defaultdict(list)
+    # Initially color the vertices by their number of incident edges and loops
+    degrees = [(sum(n.values()), sum(k for (u, _), k in n.items() if u == v)) for v, n in enumerate(neighbors)]
+    ranks = {degree: rank for rank, degree in enumerate(sorted(set(degrees)))}
+    colors = [ranks[degree] for degree in degrees]
 
+    return num_vertices, _canonical_edges(colors, neighbors, edges)
 
-def h_poly(g):
+
+# The default memo of H polynomials. Its byte budget keeps long-running enumeration workers from growing without
+# limit; a process or job may instead pass its own HPolyCache to h_poly.
+H_poly_cache = HPolyCache(max_bytes=256 * 2 ** 20)
+
+
+class _WeightedGraph:
+
+    """
+    A multigraph whose edges carry (alpha, beta) weights, with the closed-form reductions of the H polynomial.
+    """
+
+    def __init__(self, graph=None):
+        # Edge id -> [u, v, alpha, beta] and vertex -> set of incident edge ids
+        self.edges = {}
+        self.incident = {}
+        self._next_id = 0
+
+        if graph is not None:
+            for v in graph.nodes():
+                self.incident[v] = set()
+            for u, v in graph.edges():
+                self.add_edge(u, v, _ONE, _ONE)
+
+    def copy(self):
+        G = _WeightedGraph()
+        G.edges = {e: list(data) for e, data in self.edges.items()}
+        G.incident = {v: set(edges) for v, edges in self.incident.items()}
+        G._next_id = self._next_id
+        return G
+
+    def subgraph(self, edges):
+        G = _WeightedGraph()
+        for e in edges:
+            u, v, alpha, beta = self.edges[e]
+            G.incident.setdefault(u, set())
+            G.incident.setdefault(v, set())
+            G.add_edge(u, v, alpha, beta)
+        return G
+
+    def add_edge(self, u, v, alpha, beta):
+        e = self._next_id
+        self._next_id += 1
+        self.edges[e] = [u, v, alpha, beta]
+        self.incident[u].add(e)
+        self.incident[v].add(e)
+        return e
+
+    def remove_edge(self, e):
+        u, v, _, _ = self.edges.pop(e)
+        self.incident[u].discard(e)
+        self.incident[v].discard(e)
+
+    def other_end(self, e, v):
+        a, b, _, _ = self.edges[e]
+        return b if a == v else a
+
+    def contract(self, e):
+        """
+        Contracts the edge e, merging its second endpoint into the first.
+        """
+
+        u, v, _, _ = self.edges[e]
+        self.remove_edge(e)
+        for f in self.incident.pop(v):
+            data = self.edges[f]
+            if data[0] == v:
+                data[0] = u
+            if data[1] == v:
+                data[1] = u
+            self.incident[u].add(f)
+
+    def reduce(self):
+        """
+        Removes loops, pendant edges, parallel edges, and valence two vertices, and returns the product of the factors
+        they contribute to the H polynomial. Stops early if the factor is zero.
+        """
+
+        factor = _ONE
+        stack = list(self.incident)
+
+        while stack:
+            w = stack.pop()
+            if w not in self.incident:
+                continue
+
+            # Loops
+            for e in [e for e in self.incident[w] if self.edges[e][0] == self.edges[e][1]]:
+                _, _, alpha, beta = self.edges[e]
+                factor = factor * (alpha + CYCLE_FACTOR * beta)
+                self.remove_edge(e)
+
+            # Parallel edges
+            bundles = collections.defaultdict(list)
+            for e in self.incident[w]:
+                bundles[self.other_end(e, w)].append(e)
+            for u, bundle in bundles.items():
+                if len(bundle) > 1:
+                    _, _, alpha, beta = self.edges[bundle[0]]
+                    for e in bundle[1:]:
+                        _, _, alpha_e, beta_e = self.edges[e]
+                        alpha, beta = alpha * alpha_e, beta * alpha_e + alpha * beta_e + CYCLE_FACTOR * beta * beta_e
+                    for e in bundle:
+                        self.remove_edge(e)
+                    self.add_edge(w, u, alpha, beta)
+                    stack.append(u)
+
+            degree = len(self.incident[w])
+
+            # Pendant edges (P4 when the weights are equal)
+            if degree == 1 and len(self.incident) > 1:
+                e, = self.incident[w]
+                u, v, alpha, beta = self.edges[e]
+                factor = factor * (beta - alpha)
+                self.remove_edge(e)
+                del self.incident[w]
+                stack.append(v if u == w else u)
+
+            # Series edges
+            elif degree == 2:
+                e1, e2 = self.incident[w]
+                u, v = self.other_end(e1, w), self.other_end(e2, w)
+                _, _, alpha_1, beta_1 = self.edges[e1]
+                _, _, alpha_2, beta_2 = self.edges[e2]
+                self.remove_edge(e1)
+                self.remove_edge(e2)
+                del self.incident[w]
+                self.add_edge(u, v, beta_1 * alpha_2 + alpha_1 * beta_2 - alpha_1 * alpha_2, beta_1 * beta_2)
+                stack += [u, v]
+
+            if factor.is_zero():
+                break
+
+        return factor
+
+    def canonical_form(self):
+        """
+        Returns the canonical form of the graph with its edges labelled by their weights.
+        """
+
+        index = {v: i for i, v in enumerate(self.incident)}
+        return _canonical_form(len(index), [(index[u], index[v], alpha.min_exponent, tuple(alpha),
+                                             beta.min_exponent, tuple(beta))
+                                            for u, v, alpha, beta in self.edges.values()])
+
+    def blocks(self):
+        """
+        Returns the edge sets of the biconnected components (blocks) of the graph.
+        """
+
+        G = nx.Graph()
+        G.add_edges_from((u, v, {'id': e}) for e, (u, v, _, _) in self.edges.items())
+        return [[G.edges[u, v]['id'] for u, v in block] for block in nx.biconnected_component_edges(G)]
+
+
+def _degree_sum(G, e):
+    u, v, _, _ = G.edges[e]
+    return len(G.incident[u]) + len(G.incident[v])
+
+
+def _weight_size(G, e):
+    _, _, alpha, beta = G.edges[e]
+    return len(alpha) + len(beta)
+
+
+def _first_edge(G):
+    return next(iter(G.edges))
+
+
+def _heaviest_edge(G):
+    return max(G.edges, key=lambda e: (_weight_size(G, e), _degree_sum(G, e)))
+
+
+def _max_degree_edge(G):
+    return max(G.edges, key=lambda e: (_degree_sum(G, e), _weight_size(G, e)))
+
+
+def _min_degree_edge(G):
+    return min(G.edges, key=lambda e: (_degree_sum(G, e), -_weight_size(G, e)))
+
+
+def _cut_vertex_edge(G):
+    graph = nx.MultiGraph((u, v, e) for e, (u, v, _, _) in G.edges.items())
+    for e in sorted(G.edges, key=lambda e: -_degree_sum(G, e)):
+        u, v, _, _ = G.edges[e]
+        graph.remove_edge(u, v, e)
+        splits = nx.is_biconnected(graph) is False
+        graph.add_edge(u, v, e)
+        if splits:
+            return e
+    return _max_degree_edge(G)
+
+
+# Strategies for choosing the edge of P5 in a 2-connected graph of minimum degree three. Each takes a weighted graph
+# (whose edges attribute maps edge ids to [u, v, alpha, beta] and whose incident attribute maps vertices to the sets of
+# incident edge ids) and returns an edge id.
+EDGE_SELECTION_STRATEGIES = {
+    # The first edge in iteration order
+    'first': _first_edge,
+    # The edge standing in for the most parallel or series edges, i.e. the one with the largest weights
+    'heaviest': _heaviest_edge,
+    # An edge between vertices of the largest total degree
+    'max_degree': _max_degree_edge,
+    # An edge between vertices of the smallest total degree
+    'min_degree': _min_degree_edge,
+    # An edge whose deletion leaves a cut vertex, so that P3 splits the deleted graph into blocks
+    'cut_vertex': _cut_vertex_edge,
+}
+
+
+def _vertex_order(G):
+
+    """
+    Returns an order in which to introduce the vertices of a weighted graph for the path decomposition engine.
+
+    Vertices are chosen greedily so that the frontier (the introduced vertices with edges to vertices that have not
+    been introduced yet) stays small.
+    """
+
+    neighbors = {v: {G.other_end(e, v) for e in edges} - {v} for v, edges in G.incident.items()}
+    remaining = {v: len(n) for v, n in neighbors.items()}
+    introduced = set()
+    frontier = set()
+    order = []
+
+    def growth(v):
+        closed = sum(1 for u in neighbors[v] if u in frontier and remaining[u] == 1)
+        return (remaining[v] - sum(1 for u in neighbors[v] if u in introduced) > 0) - closed
+
+    candidates = set(G.incident)
+    while candidates:
+        if frontier:
+            pool = {u for v in frontier for u in neighbors[v] if u not in introduced}
+        else:
+            pool = candidates
+        v = min(pool, key=lambda v: (growth(v), -len(neighbors[v] & introduced), len(neighbors[v]), str(v)))
+
+        candidates.discard(v)
+        introduced.add(v)
+        order.append(v)
+        for u in neighbors[v]:
+            remaining[u] -= 1
+        remaining[v] = sum(1 for u in neighbors[v] if u not in introduced)
+        frontier = {u for u in frontier | {v} if remaining[u] > 0}
+
+    return order
+
+
+def _canonical_state(blocks):
+    relabel = {}
+    return tuple(relabel.setdefault(block, len(relabel)) for block in blocks)
+
+
+def _path_decomposition_h_poly(G, stats):
+
+    """
+    Computes the H polynomial of a weighted graph without loops by dynamic programming over a path decomposition.
+
+    Following the subgraph expansion of H, the edges are decided (excluded with weight alpha or included with weight
+    beta) one vertex at a time. A state records how the frontier vertices are connected by the included edges, as a
+    tuple of block labels, and maps to the sum of the weights of the partial subgraphs in that state. Including an edge
+    within a block closes a cycle (a factor of b) and a block whose last vertex leaves the frontier is a finished
+    component (a factor of -1). The number of states is bounded by the number of partitions of the frontier, so the
+    running time is exponential only in the width of the decomposition rather than in the number of edges.
+    """
+
+    order = _vertex_order(G)
+    position = {v: i for i, v in enumerate(order)}
+
+    frontier = []
+    states = {(): _ONE}
+    unseen = {v: len(edges) for v, edges in G.incident.items()}
+
+    for v in order:
+
+        # Introduce v as a block of its own
+        frontier.append(v)
+        states = {state + (len(frontier) - 1,): value for state, value in states.items()}
+
+        # Decide the edges from v to the vertices introduced before it
+        for e in G.incident[v]:
+            x, y, alpha, beta = G.edges[e]
+            u = y if x == v else x
+            if position[u] > position[v]:
+                continue
+
+            unseen[u] -= 1
+            unseen[v] -= 1
+            i, j = frontier.index(u), len(frontier) - 1
+
+            new_states = collections.defaultdict(lambda: _ZERO)
+            for state, value in states.items():
+                new_states[state] = new_states[state] + alpha * value
+                if state[i] == state[j]:
+                    new_states[state] = new_states[state] + CYCLE_FACTOR * beta * value
+                else:
+                    merged = _canonical_state([state[i] if block == state[j] else block for block in state])
+                    new_states[merged] = new_states[merged] + beta * value
+            states = {state: value for state, value in new_states.items() if not value.is_zero()}
+
+        # Forget the frontier vertices whose edges have all been decided
+        for u in [u for u in frontier if unseen[u] == 0]:
+            i = frontier.index(u)
+            frontier.pop(i)
+            new_states = collections.defaultdict(lambda: _ZERO)
+            for state, value in states.items():
+                rest = state[:i] + state[i + 1:]
+                if state[i] not in rest:
+                    value = -value
+                rest = _canonical_state(rest)
+                new_states[rest] = new_states[rest] + value
+            states = {state: value for state, value in new_states.items() if not value.is_zero()}
+
+        if stats is not None:
+            stats['max_states'] = max(stats['max_states'], len(states))
+
+    return states.get((), _ZERO)
+
+
+def _weighted_h_poly(G, select_edge, engine, cache, stats):
+
+    """
+    Computes the H polynomial of a connected weighted graph, which is modified in the process.
+    """
+
+    factor = G.reduce()
+    if factor.is_zero() or len(G.incident) == 1:
+        return -factor
+
+    if cache is not None:
+        key = G.canonical_form()
+        ans = cache.get(key)
+        if ans is not None:
+            return factor * ans
+
+    # H Polynomial property P3 at every cut vertex
+    blocks = G.blocks()
+    if len(blocks) > 1:
+        if stats is not None:
+            stats['block_splits'] += 1
+        ans = _ONE if len(blocks) % 2 == 1 else -_ONE
+        for block in blocks:
+            ans = ans * _weighted_h_poly(G.subgraph(block), select_edge, engine, cache, stats)
+            if ans.is_zero():
+                break
+
+    # Dynamic programming over a path decomposition of a 2-connected graph with minimum degree three
+    elif engine == 'path_decomposition':
+        if stats is not None:
+            stats['path_decompositions'] += 1
+        ans = _path_decomposition_h_poly(G, stats)
+
+    # H Polynomial property P5 on a 2-connected graph with minimum degree three
+    else:
+        if stats is not None:
+            stats['deletion_contractions'] += 1
+        e = select_edge(G)
+        _, _, alpha, beta = G.edges[e]
+        G_mod_e = G.copy()
+        G_mod_e.contract(e)
+        G.remove_edge(e)
+        ans = (alpha * _weighted_h_poly(G, select_edge, engine, cache, stats) +
+               beta * _weighted_h_poly(G_mod_e, select_edge, engine, cache, stats))
+
+    if cache is not None:
+        cache.set(key, ans)
+    return factor * ans
+
+
+def h_poly(g, cache=H_poly_cache, edge_selection='min_degree', stats=None, engine='deletion_contraction'):
 
     """
     Computes the H polynomial of the abstract graph g.
 
     :param g: The abstract graph
+    :param cache: An HPolyCache that memoizes the polynomials of connected graphs and of the weighted graphs met
+        during deletion-contraction, or None to disable memoization.
+    :param edge_selection: The name of one of the EDGE_SELECTION_STRATEGIES, or such a function, used to choose the
+        edge for deletion-contraction.
+    :param stats: An optional dictionary in which the numbers of deletion-contractions, block splits, and path
+        decompositions and the largest number of dynamic programming states are accumulated under
+        'deletion_contractions', 'block_splits', 'path_decompositions', and 'max_states'.
+    :param engine: How the irreducible blocks left by the closed-form reductions are evaluated, either by
+        'deletion_contraction' (P5) or by dynamic programming over a 'path_decomposition'. The latter is exponential
+        only in the pathwidth of the block, so it can evaluate large projection graphs that deletion-contraction cannot.
     :return: The H polynomial of the abstract graph g
     """
 
-    # Define the indeterminate A
-    a = pari('A')
+    if engine not in ('deletion_contraction', 'path_decomposition'):
+        raise ValueError("The engine must be 'deletion_contraction' or 'path_decomposition'.")
+
+    if stats is not None:
+        for key in ['deletion_contractions', 'block_splits', 'path_decompositions', 'max_states']:
+            stats.setdefault(key, 0)
 
     # Validate the input format
     if not isinstance(g, nx.MultiGraph):
@@ -110,7 +619,7 @@ def h_poly(g):
 
 
     if g.number_of_nodes() == 0:
-        return pari(1)
+        return LaurentPolynomial([1])
 
 
     # RECURSION LOGIC
@@ -123,71 +632,34 @@ def h_poly(g):
     if nx.is_connected(g):
 
         # Check if the graph has already been computed
-        its_hash = graph_hash(g)
-        for H, poly in H_poly_cache[its_hash]:
-            if nx.is_isomorphic(g, H):
-                return poly
-        g_for_cache = g.copy()
-
-        # H Polynomial property P4
-        # If G has a cut edge, then H(G) =  0
-        if has_cut_edge(g):
-            ans = pari(0)
-
-        else:
-            # TODO Why remove valence two vertices? Finish logic here...
-            # Collapse valence two vertices (b/c do not affect calc...)
-            g = remove_valence_two_vertices(g)
-
-            loop_factor = pari(1)
-
-            # P1 & P3
-
-            loops = [e for e in g.edges() if e[0] == e[1]]
-
-            for u, v in loops:
-                g.remove_edge(u, v)
-                loop_factor = -loop_factor * (a + 1 + a ** -1)
-
-            # correcting for the difference between ...
-            if g.number_of_nodes() == 1:
-                ans = -loop_factor
-
-            # TBD (check out the paper for formula, avoids P5 recursion?)
-            elif g.number_of_nodes() == 2:
-
-                b = -(a ** -1 + 2 + a)
-                q = g.number_of_edges()
-
-                h = ((b + 1) - (b + 1) ** q) / b
-
-                ans = loop_factor * h
-
-            # H Polynomial property P5.
-            # H(G) = H(G/e) + H(G-e)
-            else:
-                e = an_edge(g)
-                g_mod_e = nx.contracted_edge(g, e, self_loops=True)
-                g_mod_e.remove_edge(e[0], e[0])
-                g.remove_edge(*e)
-                ans = (h_poly(g_mod_e) + h_poly(g)) * loop_factor
-
-        H_poly_cache[its_hash].append((g_for_cache, ans))
+        if cache is not None:
+            key = canonical_form(g)
+            ans = cache.get(key)
+            if ans is not None:
+                return ans
+
+        # Reduce the graph by P3, P4, and closed forms for loops and parallel and series edges, and only apply P5 to
+        # the irreducible blocks that remain
+        select_edge = EDGE_SELECTION_STRATEGIES.get(edge_selection, edge_selection)
+        ans = _weighted_h_poly(_WeightedGraph(g), select_edge, engine, cache, stats)
+
+        if cache is not None:
+            cache.set(key, ans)
         return ans
 
     # Recursion logic case 2: The abstract graph contains subgraphs that are not connected.
     else:
 
         # Must initialize ans as 1 for recursive multiplication.
-        ans = pari(1)
+        ans = LaurentPolynomial([1])
 
         # H polynomial property P2
         # H(G_1 disjoint union G_2) = H(G_1) * H(G_2) where H(G_1) and H(G_2) are recursively computed.
         for vertices in nx.connected_components(g):
             S = g.subgraph(vertices).copy()
-            h = h_poly(S)
+            h = h_poly(S, cache, edge_selection, stats, engine)
             if h == 0:
-                return pari(0)
+                return LaurentPolynomial([])
 
             ans = ans * h
 
@@ -485,28 +485,24 @@ def has_r6(sgd):
 
 
 def r1_and_r2_simplify(sgd, r1_count, r2_count):
-    max_iter = 100
-    i = 0
-    sgd_has_r1 = True
-    sgd_has_r2 = True
-    while sgd_has_r1 and sgd_has_r2:
-
-        sgd_has_r1, r1_inputs = has_r1(sgd)
-        if sgd_has_r1:
-            sgd = apply_r1(sgd, r1_inputs)
-            r1_count += 1
+    """
+    Applies R1 and R2 moves to a copy of the diagram until neither applies, and returns the simplified copy with the
+    counts of moves increased by the number applied.
 
-        sgd_has_r2, r2_inputs = has_r2(sgd)
-        if sgd_has_r2:
-            sgd = apply_r2(sgd, r2_inputs)
-            r2_count += 1
+    The moves are applied in place on the copy with a worklist of the crossings next to the last move (see
+    SpatialGraphDiagram.reidemeister_reduce), rather than rescanning and copying the whole diagram after each move.
 
-        if i > max_iter:
-            raise ValueError(f"R1 and R2 simplification has been looping for {i} times. This is likely an error.")
+    Only R2 moves across a bigon face of the diagram are applied (see SpatialGraphDiagram.find_r2): two crossings joined
+    by edges at consecutive inputs of both. This is narrower than has_r2, which accepts any two crossings that share two
+    edges passing over or under both of them, so pairs of crossings that has_r2 would cancel without such a face are
+    kept.
+    """
 
-        i += 1
+    sgd = sgd.copy()
+    counts = {'r1': r1_count, 'r2': r2_count}
+    sgd.reidemeister_reduce(counts=counts)
 
-    return sgd, r1_count, r2_count
+    return sgd, counts['r1'], counts['r2']
 
 
 def reidemeister_simplify(sgd, n_tries=10):
@@ -1,3 +1,5 @@
+from .laurent_polynomials import LaurentPolynomial
+
 from .H_polynomial import h_poly, has_cut_edge, remove_valence_two_vertices
 
 from yamada.diagram_elements import Vertex, Edge, Crossing
@@ -5,7 +7,7 @@ from yamada.diagram_elements import Vertex, Edge, Crossing
 from yamada.Reidemeister import has_r1, apply_r1, has_r2, apply_r2, has_r3, apply_r3
 
 from .spatial_graphs import SpatialGraph
-from .spatial_graph_diagrams import SpatialGraphDiagram, normalize_yamada_polynomial, reverse_poly
+from .spatial_graph_diagrams import SpatialGraphDiagram, normalize_yamada_polynomial, reverse_poly, yamada_polynomials
 
 from .enumeration import enumerate_yamada_classes
 from .utilities import extract_graph_from_json_file
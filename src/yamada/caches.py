@@ -0,0 +1,249 @@
+"""Caches
+
+Bounded memo tables shared by the polynomial calculators.
+
+Computing Yamada and H polynomials revisits the same (isomorphic) diagrams and graphs many times, both within a single
+evaluation and across every diagram of an enumeration run. The caches in this module store those results under a
+hashable key while keeping memory use bounded for long-running processes.
+"""
+
+import collections
+import sys
+
+
+def approximate_size(obj):
+    """
+    Returns the approximate number of bytes used by an object, including the contents of tuples, lists, sets, and
+    dictionaries. Shared objects (such as small integers) are counted every time they appear.
+    """
+
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, (tuple, list, set, frozenset)):
+        size += sum(approximate_size(item) for item in obj)
+    elif isinstance(obj, dict):
+        size += sum(approximate_size(key) + approximate_size(value) for key, value in obj.items())
+
+    return size
+
+
+class BoundedCache:
+    """
+    A memo table with a maximum number of entries and/or bytes.
+
+    When the cache is full, entries are evicted either least-recently-used first ('lru') or least-frequently-used first
+    ('lfu', breaking ties by recency). Hits, misses, and evictions are counted so the effectiveness of the cache can be
+    measured.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, policy='lru'):
+        """
+        :param max_entries: The maximum number of stored entries, or None for no limit.
+        :param max_bytes: The maximum approximate size of the stored keys and values in bytes, or None for no limit.
+        :param policy: The eviction policy, 'lru' or 'lfu'.
+        """
+
+        if max_entries is not None and max_entries < 1:
+            raise ValueError('The cache must be able to hold at least one entry.')
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError('The cache must be able to hold at least one byte.')
+        if policy not in ('lru', 'lfu'):
+            raise ValueError("The eviction policy must be 'lru' or 'lfu'.")
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+
+        # Entries in least-recently-used order
+        self._entries = collections.OrderedDict()
+
+        # Sizes of the entries, if there is a byte budget
+        self._sizes = {}
+        self.nbytes = 0
+
+        # Use counts of the entries, and the entries with each use count in least-recently-used order (LFU only)
+        self._counts = {}
+        self._by_count = collections.defaultdict(collections.OrderedDict)
+        self._min_count = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def items(self):
+        """
+        Returns a list of the stored (key, value) pairs without marking them as used.
+        """
+
+        return list(self._entries.items())
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored under key (marking it as used), or default if it is not cached.
+        """
+
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self._touch(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """
+        Stores value under key, evicting entries if the cache is full.
+
+        A value that is larger than the byte budget on its own is not stored.
+        """
+
+        if key in self._entries:
+            self._discard(key)
+
+        size = self.sizeof(key, value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        # Make room before inserting so that a new entry is never its own victim
+        while self._entries and self._is_full(size):
+            self._discard(self._victim())
+            self.evictions += 1
+
+        self._entries[key] = value
+
+        if self.max_bytes is not None:
+            self._sizes[key] = size
+            self.nbytes += size
+
+        if self.policy == 'lfu':
+            self._counts[key] = 1
+            self._by_count[1][key] = None
+            self._min_count = 1
+
+    def sizeof(self, key, value):
+        """
+        Returns the approximate number of bytes used by an entry.
+        """
+
+        return approximate_size(key) + approximate_size(value)
+
+    def clear(self):
+        """
+        Removes all entries and resets the counters.
+        """
+
+        self._entries.clear()
+        self._sizes.clear()
+        self._counts.clear()
+        self._by_count.clear()
+        self._min_count = 0
+        self.nbytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _is_full(self, size):
+        if self.max_entries is not None and len(self._entries) >= self.max_entries:
+            return True
+        if self.max_bytes is not None and self.nbytes + size > self.max_bytes:
+            return True
+        return False
+
+    def _touch(self, key):
+        if self.policy == 'lru':
+            self._entries.move_to_end(key)
+            return
+
+        count = self._counts[key]
+        self._counts[key] = count + 1
+        self._by_count[count + 1][key] = None
+
+        # If the key was the last one with the minimum count, the minimum is now its new count
+        del self._by_count[count][key]
+        if not self._by_count[count]:
+            del self._by_count[count]
+            if self._min_count == count:
+                self._min_count = count + 1
+
+    def _victim(self):
+        if self.policy == 'lru':
+            return next(iter(self._entries))
+        return next(iter(self._by_count[self._min_count]))
+
+    def _discard(self, key):
+        del self._entries[key]
+
+        if self.max_bytes is not None:
+            self.nbytes -= self._sizes.pop(key)
+
+        if self.policy == 'lfu':
+            self._remove_count(key, self._counts.pop(key))
+
+    def _remove_count(self, key, count):
+        del self._by_count[count][key]
+        if not self._by_count[count]:
+            del self._by_count[count]
+            if self._min_count == count:
+                self._min_count = min(self._by_count, default=0)
+
+
+class HPolyCache(BoundedCache):
+    """
+    A memo table of H polynomials keyed by the canonical forms of graphs (see yamada.H_polynomial.canonical_form),
+    whose edges may carry weight labels.
+
+    In addition to hits and misses, the cache counts collisions: misses on a graph with the same number of vertices,
+    number of edges, and degree sequence as a cached graph that it is not isomorphic to. These are the lookups that
+    would have required isomorphism tests had the cache been keyed by a graph invariant.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, policy='lru'):
+        super().__init__(max_entries, max_bytes, policy)
+        self._invariants = collections.Counter()
+        self.collisions = 0
+
+    @staticmethod
+    def invariant(key):
+        """
+        Returns the number of vertices, the number of edges, and the degree sequence of the graph with the given key.
+        """
+
+        num_vertices, edges = key
+        degrees = [0] * num_vertices
+        for u, v, *_ in edges:
+            degrees[u] += 1
+            degrees[v] += 1
+
+        return num_vertices, len(edges), tuple(sorted(degrees))
+
+    def get(self, key, default=None):
+        value = super().get(key, self)
+        if value is not self:
+            return value
+
+        if self._invariants[self.invariant(key)] > 0:
+            self.collisions += 1
+        return default
+
+    def set(self, key, value):
+        super().set(key, value)
+        if key in self._entries:
+            self._invariants[self.invariant(key)] += 1
+
+    def clear(self):
+        super().clear()
+        self._invariants.clear()
+        self.collisions = 0
+
+    def _discard(self, key):
+        super()._discard(key)
+        self._invariants[self.invariant(key)] -= 1
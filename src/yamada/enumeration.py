@@ -1,11 +1,15 @@
 import networkx as nx
 import collections
 import itertools
+import os
+import pickle
 import subprocess
-import io
+import tempfile
 import time
 from yamada.diagram_elements import Vertex, Crossing, Edge
 from yamada.spatial_graph_diagrams import SpatialGraphDiagram
+from yamada.Reidemeister import has_r6
+from yamada.H_polynomial import canonical_form
 
 
 def shadows_via_plantri_by_ascii(plantri_directory, num_tri_verts, num_crossings):
@@ -45,7 +49,28 @@ def read_edge_code(stream, size):
     return ans
 
 
-def shadows_via_plantri_by_edge_codes(plantri_directory, num_tri_verts, num_crossings):
+def parse_edge_codes(buffer):
+    """
+    Parses the complete 1 byte edge codes at the start of a buffer of plantri output.
+
+    Returns the list of edge codes and the number of bytes they used; an incomplete edge code at the end of the buffer
+    is left for the next call. Each edge code is split into the edges around each vertex at the 255 separators in a
+    single bytes.split call rather than byte by byte.
+    """
+    view = memoryview(buffer)
+    codes = []
+    pos = 0
+    while pos < len(buffer):
+        size = buffer[pos]
+        assert size != 0
+        if pos + 1 + size > len(buffer):
+            break
+        codes.append([list(edges) for edges in view[pos + 1:pos + 1 + size].tobytes().split(b'\xff')])
+        pos += 1 + size
+    return codes, pos
+
+
+def plantri_command(plantri_directory, num_tri_verts, num_crossings, res=None, mod=None):
     assert num_tri_verts % 2 == 0
     vertices = num_tri_verts + num_crossings
     edges = (3 * num_tri_verts + 4 * num_crossings) // 2
@@ -58,19 +83,68 @@ def shadows_via_plantri_by_edge_codes(plantri_directory, num_tri_verts, num_cros
            '-E',  # return binary edge code format
            '-e%d' % edges,
            '%d' % faces]
-    proc = subprocess.run(' '.join(cmd), shell=True, capture_output=True)
-    stdout = io.BytesIO(proc.stdout)
-    assert stdout.read(13) == b'>>edge_code<<'
-    shadows = []
-    while True:
-        b = stdout.read(1)
-        if len(b) == 0:
-            break
-        size = int.from_bytes(b, 'big')
-        assert size != 0
-        shadows.append(read_edge_code(stdout, size))
+    if mod is not None:
+        cmd.append('%d/%d' % (res, mod))  # only output part res of mod of the shadows
+    return cmd
 
-    return shadows
+
+def iter_shadows_via_plantri(plantri_directory, num_tri_verts, num_crossings, res=None, mod=None,
+                             buffer_size=2 ** 16):
+    """
+    Generates the edge codes of the shadows as plantri writes them.
+
+    The output of plantri is read from a pipe in blocks of buffer_size bytes and parsed a block at a time, so memory
+    use does not grow with the number of shadows and the first shadows are available immediately. Closing the
+    generator early stops plantri.
+
+    If res and mod are given, plantri only generates part res (0 <= res < mod) of a partition of the shadows into mod
+    parts, so that the parts may be generated in parallel.
+
+    Raises a RuntimeError, with the error output of plantri, if plantri cannot be run or fails.
+    """
+    cmd = plantri_command(plantri_directory, num_tri_verts, num_crossings, res, mod)
+
+    # The error output goes to a file so that plantri cannot block on a full pipe that is only read on failure
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen(' '.join(cmd), shell=True, stdout=subprocess.PIPE, stderr=stderr)
+        try:
+            header = proc.stdout.read(13)
+            if header != b'>>edge_code<<':
+                proc.kill()
+                proc.wait()
+                raise RuntimeError(_plantri_error(cmd, 'did not write an edge code header', stderr))
+
+            buffer = b''
+            while True:
+                block = proc.stdout.read1(buffer_size)
+                if len(block) == 0:
+                    break
+                buffer = buffer + block if buffer else block
+                codes, used = parse_edge_codes(buffer)
+                buffer = buffer[used:]
+                yield from codes
+
+            assert len(buffer) == 0
+
+            if proc.wait() != 0:
+                raise RuntimeError(_plantri_error(cmd, 'exited with status %d' % proc.returncode, stderr))
+
+        finally:
+            # Only stop plantri if the consumer closed the generator early (or the output was invalid)
+            proc.stdout.close()
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+
+
+def _plantri_error(cmd, problem, stderr):
+    stderr.seek(0)
+    output = stderr.read().decode(errors='replace').strip()
+    return 'plantri (%s) %s: %s' % (' '.join(cmd), problem, output or 'no error output')
+
+
+def shadows_via_plantri_by_edge_codes(plantri_directory, num_tri_verts, num_crossings):
+    return list(iter_shadows_via_plantri(plantri_directory, num_tri_verts, num_crossings))
 
 
 class Shadow:
@@ -107,48 +181,390 @@ class Shadow:
 
         return SpatialGraphDiagram(classes, check=check)
 
+    def _other_ends(self):
+        """
+        Returns a map from each dart (vertex index in edge_codes, position) to the dart at the other end of its edge.
+        """
+        darts = collections.defaultdict(list)
+        for v, edges in enumerate(self.edge_codes):
+            for i, e in enumerate(edges):
+                darts[e].append((v, i))
+
+        other_ends = dict()
+        for a, b in darts.values():
+            other_ends[a] = b
+            other_ends[b] = a
+        return other_ends
+
+    def map_automorphisms(self):
+        """
+        Returns the automorphisms of the shadow as a map in the sphere, including those that reverse its orientation.
+
+        Each automorphism is a list giving, for every vertex (index in edge_codes), its image, the position there of
+        the image of its position 0, and the orientation (1 or -1) in which positions are mapped. An automorphism is
+        determined by the image of a single dart, so each candidate image of the first dart is extended along the
+        edges and kept if it is consistent.
+        """
+        codes = self.edge_codes
+        other_ends = self._other_ends()
+        ans = []
+
+        for w, q, o in itertools.product(range(len(codes)), range(4), (1, -1)):
+            if q >= len(codes[w]) or len(codes[w]) != len(codes[0]):
+                continue
+
+            images = {0: (w, q, o)}
+            queue = [0]
+            consistent = True
+            while queue and consistent:
+                u = queue.pop()
+                u_image, base, _ = images[u]
+                for p in range(len(codes[u])):
+                    x, r = other_ends[u, p]
+                    x_image, r_image = other_ends[u_image, (base + o * p) % len(codes[u_image])]
+                    if len(codes[x]) != len(codes[x_image]):
+                        consistent = False
+                        break
+                    image = (x_image, (r_image - o * r) % len(codes[x]), o)
+                    if x not in images:
+                        images[x] = image
+                        queue.append(x)
+                    elif images[x] != image:
+                        consistent = False
+                        break
+
+            if consistent and len({image[0] for image in images.values()}) == len(codes):
+                ans.append([images[v] for v in range(len(codes))])
+
+        return ans
+
+    def sign_symmetries(self):
+        """
+        Returns the action of the automorphisms of the shadow on the crossing signs of its diagrams.
+
+        Each action is a pair (images, flips) of lists indexed by crossing: the diagram with signs s is isomorphic to, or
+        the mirror image of, the one whose sign at images[c] is s[c] ^ flips[c]. Since the edge at position i of a crossing is
+        over when i + s[c] is odd, a crossing mapped with its positions offset by k changes sign when k is odd.
+        """
+        crossing_index = {v: c for c, v in enumerate(v for v, edges in enumerate(self.edge_codes) if len(edges) == 4)}
+
+        ans = []
+        for automorphism in self.map_automorphisms():
+            images, flips = [], []
+            for v, c in crossing_index.items():
+                v_image, base, _ = automorphism[v]
+                images.append(crossing_index[v_image])
+                flips.append(base % 2)
+            ans.append((images, flips))
+        return ans
+
+    def r2_constraints(self):
+        """
+        Returns the pairs of crossings whose signs determine whether the diagram has a Reidemeister 2 move.
+
+        As in yamada.Reidemeister.has_r2, two crossings allow an R2 move when two edges join them and each of those
+        edges passes over (or under) both. Each constraint is (c1, c2, parity) with c1 < c2, and the diagram has an R2
+        move if and only if signs[c1] ^ signs[c2] == parity for some constraint.
+        """
+        crossing_index = {v: c for c, v in enumerate(v for v, edges in enumerate(self.edge_codes) if len(edges) == 4)}
+        other_ends = self._other_ends()
+
+        # The parities of the positions at which each pair of crossings share an edge
+        shared = collections.defaultdict(set)
+        for (v, i), (w, j) in other_ends.items():
+            if v in crossing_index and w in crossing_index and crossing_index[v] < crossing_index[w]:
+                shared[crossing_index[v], crossing_index[w]].add((i, j))
+
+        ans = []
+        for (c1, c2), positions in sorted(shared.items()):
+            parities = collections.Counter((i + j) % 2 for i, j in positions)
+            for parity, count in sorted(parities.items()):
+                if count >= 2:
+                    ans.append((c1, c2, parity))
+        return ans
+
+    def sign_vectors(self):
+        """
+        Generates one crossing sign vector from each class of diagrams of the shadow that are isomorphic or mirror
+        images, skipping those with Reidemeister 2 moves.
+
+        Sign vectors are built one crossing at a time, and prefixes that already violate an R2 constraint are
+        abandoned. A complete vector is generated only if it is lexicographically smallest among its images under the
+        symmetries of the shadow and the mirror that switches every crossing; in particular its first sign is 0.
+        """
+        num_cross = len(self.crossings)
+        if num_cross == 0:
+            yield ()
+            return
+
+        constraints = collections.defaultdict(list)
+        for c1, c2, parity in self.r2_constraints():
+            constraints[c2].append((c1, parity))
+        symmetries = self.sign_symmetries()
+
+        def is_smallest(signs):
+            for images, flips in symmetries:
+                image = num_cross * [0]
+                for c, sign in enumerate(signs):
+                    image[images[c]] = sign ^ flips[c]
+                if tuple(image) < signs or tuple(1 - sign for sign in image) < signs:
+                    return False
+            return True
+
+        signs = num_cross * [0]
+
+        def extend(c):
+            if c == num_cross:
+                if is_smallest(tuple(signs)):
+                    yield tuple(signs)
+                return
+            for sign in ((0,) if c == 0 else (0, 1)):
+                signs[c] = sign
+                if all(signs[c1] ^ sign != parity for c1, parity in constraints[c]):
+                    yield from extend(c + 1)
+
+        yield from extend(0)
+
+
+def graph_invariants(graph):
+    """
+    Returns the number of vertices and edges, the degree sequence, and the sorted multiplicities of the edges (with
+    loops counted separately) of a multigraph. These are cheap to compare and preserved by isomorphisms.
+    """
+    multiplicities = collections.Counter()
+    for u, v in graph.edges():
+        multiplicities[frozenset((u, v))] += 1
+    return (graph.number_of_nodes(),
+            graph.number_of_edges(),
+            tuple(sorted(d for _, d in graph.degree)),
+            tuple(sorted((len(pair), count) for pair, count in multiplicities.items())))
+
+
+class TargetGraph:
+    """
+    The graph that the underlying graphs of enumerated diagrams must be isomorphic to, with its invariants precomputed.
+
+    Candidates are compared by their cheap invariants, then by their Weisfeiler-Lehman hashes, and only then by their
+    canonical forms, which decide isomorphism exactly. Since the vertices of every shadow are labelled the same way,
+    many shadows have identical underlying graphs, so the results are memoized by labelled edge list.
+    """
+    def __init__(self, graph):
+        self.graph = graph
+        self.invariants = graph_invariants(graph)
+        self.wl_hash = nx.weisfeiler_lehman_graph_hash(graph, iterations=2)
+        self.canonical_form = canonical_form(graph)
+        self._results = dict()
+
+    def is_isomorphic(self, graph):
+        if graph is None:
+            return False
+
+        key = tuple(sorted(tuple(sorted(edge)) for edge in graph.edges()))
+        if key not in self._results:
+            self._results[key] = self._is_isomorphic(graph)
+        return self._results[key]
+
+    def _is_isomorphic(self, graph):
+        if graph_invariants(graph) != self.invariants:
+            return False
+        if nx.weisfeiler_lehman_graph_hash(graph, iterations=2) != self.wl_hash:
+            return False
+        return canonical_form(graph) == self.canonical_form
 
-def spatial_graph_diagrams_fixed_crossings(G, crossings):
+
+def spatial_graph_diagrams_fixed_crossings(G, crossings, plantri_directory='./', res=None, mod=None):
     """
-    Let's start with the theta graph
+    Generates the diagrams of G with the given number of crossings and without Reidemeister 2 or 6 moves.
+
+    For each shadow only one sign vector is generated from each class of sign vectors that are related by a symmetry
+    of the shadow or by switching every crossing (see Shadow.sign_vectors), so the diagrams are counted per class
+    rather than per sign vector. Let's start with the theta graph
 
     >>> T = nx.MultiGraph(3*[(0, 1)])
     >>> len(list(spatial_graph_diagrams_fixed_crossings(T, 3)))
-    2
+    3
+    >>> len(list(spatial_graph_diagrams_fixed_crossings(T, 4)))
+    12
     """
     assert all(d == 3 for v, d in G.degree)
     assert all(a != b for a, b in G.edges())
 
-    raw_shadows = shadows_via_plantri_by_edge_codes(G.number_of_nodes(), crossings)
+    raw_shadows = iter_shadows_via_plantri(plantri_directory, G.number_of_nodes(), crossings, res, mod)
+    target = TargetGraph(G)
 
     for raw_shadow in raw_shadows:
         shadow = Shadow(raw_shadow)
         diagram = shadow.spatial_graph_diagram(check=False)
         U = diagram.underlying_graph()
         if U is not None:
-            if nx.is_isomorphic(G, U):
-                if not diagram.has_r6():
-                    num_cross = len(shadow.crossings)
-                    if num_cross == 0:
+            if target.is_isomorphic(U):
+                if not has_r6(diagram):
+                    if len(shadow.crossings) == 0:
                         yield diagram
                     else:
-                        for signs in itertools.product((0, 1), repeat=num_cross - 1):
-                            signs = (0,) + signs
-                            D = shadow.spatial_graph_diagram(signs=signs, check=False)
-                            if not D.has_r2():
-                                yield D
+                        for signs in shadow.sign_vectors():
+                            yield shadow.spatial_graph_diagram(signs=signs, check=False)
 
 
-def enumerate_yamada_classes(G, max_crossings):
-    examined = 0
-    polys = dict()
+class EnumerationCheckpoint:
+    """
+    The progress of an enumeration of the Yamada classes of a graph, which may be saved to a file so that an
+    interrupted run can be resumed.
+
+    The state is the polynomial-to-representative map, the number of diagrams examined, the time spent on each number
+    of crossings, the crossing numbers that are complete and, for those in progress, the classes found so far, the
+    number of diagrams already examined (diagrams are generated in the same order on every run), and the plantri
+    shards already merged.
+    """
+    def __init__(self, graph, path=None, interval=60.0):
+        """
+        :param graph: The graph being enumerated.
+        :param path: The file the checkpoint is saved to, or None to keep it in memory only.
+        :param interval: The minimum number of seconds between periodic saves.
+        """
+        self.graph = canonical_form(graph)
+        self.path = path
+        self.interval = interval
+
+        self.polys = dict()
+        self.examined = 0
+        self.timings = dict()
+        self.completed = set()
+        self.offsets = collections.Counter()
+        self.level_polys = collections.defaultdict(dict)
+        self.shards = collections.defaultdict(set)
+        self.num_shards = None
+
+        self._last_save = time.time()
+
+    @classmethod
+    def start(cls, graph, path=None, resume=False, interval=60.0):
+        """
+        Returns the checkpoint saved at path if resume is true and it exists, or else a new one.
+        """
+        if path is None or not resume or not os.path.exists(path):
+            return cls(graph, path, interval)
+
+        with open(path, 'rb') as file:
+            checkpoint = pickle.load(file)
+        if checkpoint.graph != canonical_form(graph):
+            raise ValueError('The checkpoint at %s is for a different graph.' % path)
+
+        checkpoint.path = path
+        checkpoint.interval = interval
+        checkpoint._last_save = time.time()
+        return checkpoint
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['path'], state['interval'], state['_last_save']
+        return state
+
+    def save(self):
+        """
+        Writes the checkpoint to its file, replacing the previous one only once it is completely written.
+        """
+        self._last_save = time.time()
+        if self.path is None:
+            return
+
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self.path)
+
+    def save_periodically(self):
+        if time.time() - self._last_save >= self.interval:
+            self.save()
+
+    def add(self, crossings, p, D):
+        """
+        Records the polynomial of the next diagram with the given number of crossings.
+        """
+        self.add_polys(crossings, {p: D}, 1)
+
+    def add_polys(self, crossings, polys, examined):
+        """
+        Merges a polynomial-to-representative map found by examining diagrams with the given number of crossings.
+        """
+        level_polys = self.level_polys[crossings]
+        for p, D in polys.items():
+            if p not in self.polys:
+                self.polys[p] = D
+            if p not in level_polys:
+                level_polys[p] = D
+        self.examined += examined
+        self.offsets[crossings] += examined
+
+    def add_shard(self, crossings, res, polys, examined):
+        """
+        Merges the results of part res of the shadows with the given number of crossings.
+        """
+        self.add_polys(crossings, polys, examined)
+        self.shards[crossings].add(res)
+
+    def load_level(self, crossings, store):
+        """
+        Merges the classes with the given number of crossings from an EnumerationStore (or None), and returns whether
+        they were stored.
+        """
+        level = store.get_level(self.graph, crossings) if store is not None else None
+        if level is None:
+            return False
+
+        # Discard any partial progress on the level
+        self.examined -= self.offsets[crossings]
+        self.offsets[crossings] = 0
+        self.level_polys.pop(crossings, None)
+
+        self.add_polys(crossings, *level)
+        self.complete(crossings, 0)
+        return True
+
+    def complete(self, crossings, elapsed, store=None):
+        """
+        Marks the given number of crossings as complete, recording the classes found with exactly that many crossings
+        in an EnumerationStore (or None).
+
+        A level in which no diagrams were examined is not stored, so that a shadow source that produced nothing can
+        never be recorded as a finished enumeration; it is simply enumerated again by later runs.
+        """
+        if store is not None and (self.offsets[crossings] > 0 or len(self.level_polys[crossings]) > 0):
+            store.put_level(self.graph, crossings, self.level_polys[crossings], self.offsets[crossings])
+
+        self.timings[crossings] = self.timings.get(crossings, 0) + elapsed
+        self.completed.add(crossings)
+        self.offsets.pop(crossings, None)
+        self.level_polys.pop(crossings, None)
+        self.shards.pop(crossings, None)
+        self.save()
+
+
+def enumerate_yamada_classes(G, max_crossings, checkpoint=None, resume=False, checkpoint_interval=60.0, store=None):
+    """
+    Returns a map from the normalized Yamada polynomials of the diagrams of G with at most max_crossings crossings to
+    representative diagrams, and the number of diagrams examined. Only one diagram of each class of sign vectors of a
+    shadow is examined (see spatial_graph_diagrams_fixed_crossings), so the count is of those classes rather than of
+    every sign vector.
+
+    If checkpoint is a path, the progress is saved there every checkpoint_interval seconds and after each number of
+    crossings. With resume=True, a run continues from the checkpoint at that path (if it exists), skipping the
+    crossing numbers it completed and the diagrams it already examined.
+
+    If store is an EnumerationStore (see yamada.enumeration_store), the classes of the crossing numbers it holds for
+    G are read from it rather than recomputed, and those of every other crossing number are added to it.
+    """
+    state = EnumerationCheckpoint.start(G, checkpoint, resume, checkpoint_interval)
     for crossings in range(0, max_crossings + 1):
-        for D in spatial_graph_diagrams_fixed_crossings(G, crossings):
-            p = D.normalized_yamada_polynomial()
-            if p not in polys:
-                polys[p] = D
-            examined += 1
-    return polys, examined
+        if crossings in state.completed or state.load_level(crossings, store):
+            continue
+        start = time.time()
+        diagrams = spatial_graph_diagrams_fixed_crossings(G, crossings)
+        for D in itertools.islice(diagrams, state.offsets[crossings], None):
+            state.add(crossings, D.normalized_yamada_polynomial(), D)
+            state.save_periodically()
+        state.complete(crossings, time.time() - start, store)
+    return state.polys, state.examined
 
 
 def to_poly(diagram):
@@ -156,20 +572,69 @@ def to_poly(diagram):
     return p, diagram
 
 
-def enumerate_yamada_classes_multicore(G, max_crossings, pool):
-    examined = 0
-    polys = dict()
-    timings = dict()
+def enumerate_yamada_classes_multicore(G, max_crossings, pool, checkpoint=None, resume=False,
+                                       checkpoint_interval=60.0, store=None):
+    """
+    Like enumerate_yamada_classes, but the diagrams are evaluated by a pool of processes. When checkpointing, the
+    results are collected in the order the diagrams were generated, so that a resumed run can skip those examined.
+    """
+    state = EnumerationCheckpoint.start(G, checkpoint, resume, checkpoint_interval)
+    imap = pool.imap if checkpoint is not None else pool.imap_unordered
     for crossings in range(0, max_crossings + 1):
+        if crossings in state.completed or state.load_level(crossings, store):
+            continue
         start = time.time()
         diagrams = spatial_graph_diagrams_fixed_crossings(G, crossings)
-        some_polys = pool.imap_unordered(to_poly, diagrams)
+        some_polys = imap(to_poly, itertools.islice(diagrams, state.offsets[crossings], None))
         for p, D in some_polys:
-            if p not in polys:
-                polys[p] = D
-            examined += 1
-        timings[crossings] = time.time() - start
-    return polys, timings, examined
+            state.add(crossings, p, D)
+            state.save_periodically()
+        state.complete(crossings, time.time() - start, store)
+    return state.polys, state.timings, state.examined
+
+
+def enumerate_shard(args):
+    """
+    Enumerates the Yamada classes of the diagrams from part res of mod of the shadows with the given crossings.
+    """
+    G, crossings, res, mod, plantri_directory = args
+    examined = 0
+    polys = dict()
+    for D in spatial_graph_diagrams_fixed_crossings(G, crossings, plantri_directory, res, mod):
+        p = D.normalized_yamada_polynomial()
+        if p not in polys:
+            polys[p] = D
+        examined += 1
+    return polys, examined
+
+
+def enumerate_yamada_classes_sharded(G, max_crossings, pool, num_shards, plantri_directory='./', checkpoint=None,
+                                     resume=False, store=None):
+    """
+    Like enumerate_yamada_classes_multicore, but each worker of the pool runs its own plantri on a res/mod part of the
+    shadows and filters and evaluates them locally, so only the polynomial-to-diagram map of each shard is sent back
+    to be merged. The shards are merged in order, so the representative diagrams do not depend on timing.
+
+    If checkpoint is a path, the progress is saved there after every shard, and with resume=True a run continues from
+    it, skipping the crossing numbers and shards already merged. Crossing numbers are read from and added to an
+    EnumerationStore as in enumerate_yamada_classes.
+    """
+    state = EnumerationCheckpoint.start(G, checkpoint, resume)
+    if state.num_shards is not None and state.num_shards != num_shards:
+        raise ValueError('The checkpoint was made with %d shards, not %d.' % (state.num_shards, num_shards))
+    state.num_shards = num_shards
+
+    for crossings in range(0, max_crossings + 1):
+        if crossings in state.completed or state.load_level(crossings, store):
+            continue
+        start = time.time()
+        remaining = [res for res in range(num_shards) if res not in state.shards[crossings]]
+        shards = [(G, crossings, res, num_shards, plantri_directory) for res in remaining]
+        for res, (some_polys, some_examined) in zip(remaining, pool.imap(enumerate_shard, shards)):
+            state.add_shard(crossings, res, some_polys, some_examined)
+            state.save()
+        state.complete(crossings, time.time() - start, store)
+    return state.polys, state.timings, state.examined
 
 
 def num_automorphisms(graph):
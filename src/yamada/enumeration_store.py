@@ -0,0 +1,106 @@
+"""Enumeration store
+
+A persistent record of the Yamada classes found for each graph and number of crossings.
+
+Enumerations are usually extended one crossing number at a time, and the diagrams with fewer crossings do not change
+when max_crossings is raised. An EnumerationStore keeps, for each graph (by its canonical form, see
+yamada.H_polynomial.canonical_form) and each number of crossings, the distinct normalized Yamada polynomials of the
+diagrams with exactly that many crossings, a representative diagram of each, and the number of diagrams examined.
+Passing a store to the enumeration functions makes them evaluate only the crossing numbers that are not stored:
+
+    with EnumerationStore('enumerations.sqlite') as store:
+        polys, examined = enumerate_yamada_classes(G, 6, store=store)
+"""
+
+import pickle
+import sqlite3
+from yamada.h_poly_store import _encode_key, _encode_poly, _decode_poly
+
+
+class EnumerationStore:
+    """
+    An SQLite table of the Yamada classes of the diagrams of graphs with a given number of crossings.
+
+    The representative diagrams are stored pickled, so a store should only be loaded from a trusted source.
+    """
+
+    def __init__(self, path, readonly=False, timeout=60.0):
+        """
+        :param path: The path of the database file. It is created unless the store is read-only.
+        :param readonly: Open the database read-only.
+        :param timeout: Seconds to wait for the write lock held by another process.
+        """
+
+        self.path = path
+        self.readonly = readonly
+
+        if readonly:
+            self._connection = sqlite3.connect('file:%s?mode=ro' % path, uri=True, timeout=timeout)
+        else:
+            self._connection = sqlite3.connect(path, timeout=timeout)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS levels '
+                                     '(graph TEXT, crossings INTEGER, examined INTEGER, '
+                                     'PRIMARY KEY (graph, crossings))')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS classes '
+                                     '(graph TEXT, crossings INTEGER, position INTEGER, '
+                                     'min_exponent INTEGER, coefficients TEXT, diagram BLOB, '
+                                     'PRIMARY KEY (graph, crossings, position))')
+            self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def levels(self, key):
+        """
+        Returns the sorted crossing numbers stored for the graph with the given canonical form.
+        """
+
+        rows = self._connection.execute('SELECT crossings FROM levels WHERE graph = ? ORDER BY crossings',
+                                        (_encode_key(key),))
+        return [crossings for crossings, in rows]
+
+    def get_level(self, key, crossings):
+        """
+        Returns the map from the normalized Yamada polynomials of the diagrams with the given number of crossings of
+        the graph with the given canonical form to representative diagrams, in the order they were found, and the
+        number of diagrams examined; or None if the crossing number is not stored.
+        """
+
+        graph = _encode_key(key)
+        row = self._connection.execute('SELECT examined FROM levels WHERE graph = ? AND crossings = ?',
+                                       (graph, crossings)).fetchone()
+        if row is None:
+            return None
+
+        polys = dict()
+        rows = self._connection.execute('SELECT min_exponent, coefficients, diagram FROM classes '
+                                        'WHERE graph = ? AND crossings = ? ORDER BY position', (graph, crossings))
+        for min_exponent, coefficients, diagram in rows:
+            polys[_decode_poly(min_exponent, coefficients)] = pickle.loads(diagram)
+        return polys, row[0]
+
+    def put_level(self, key, crossings, polys, examined):
+        """
+        Stores the polynomial-to-representative map and the number of diagrams examined for the diagrams with the
+        given number of crossings of the graph with the given canonical form, in a single transaction.
+        """
+
+        if self.readonly:
+            raise ValueError('The store is read-only.')
+
+        graph = _encode_key(key)
+        rows = [(graph, crossings, position, p.min_exponent, _encode_poly(p),
+                 pickle.dumps(D, protocol=pickle.HIGHEST_PROTOCOL))
+                for position, (p, D) in enumerate(polys.items())]
+
+        with self._connection:
+            self._connection.execute('DELETE FROM classes WHERE graph = ? AND crossings = ?', (graph, crossings))
+            self._connection.executemany('INSERT INTO classes VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self._connection.execute('INSERT OR REPLACE INTO levels VALUES (?, ?, ?)', (graph, crossings, examined))
@@ -165,6 +165,75 @@ def get_line_segment_intersection(a: np.ndarray,
     return min_dist, min_dist_position
 
 
+def get_line_segment_intersections(a: np.ndarray,
+                                   b: np.ndarray,
+                                   c: np.ndarray,
+                                   d: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the minimum Euclidean distances between many pairs of line segments AB and CD, and the positions on AB
+    where they are attained.
+
+    This is a vectorized version of get_line_segment_intersection: the segments are given as (N, 2) or (N, 3) arrays
+    of endpoints, the degenerate (point) and parallel cases are handled with masks, and the results agree with N calls
+    of get_line_segment_intersection.
+
+    :param a: A numpy array of shape (N, k) containing the first endpoints of the segments AB.
+    :param b: A numpy array of shape (N, k) containing the second endpoints of the segments AB.
+    :param c: A numpy array of shape (N, k) containing the first endpoints of the segments CD.
+    :param d: A numpy array of shape (N, k) containing the second endpoints of the segments CD.
+    :return: A numpy array of shape (N,) of minimum distances and a numpy array of shape (N, k) of positions on AB.
+    """
+
+    a, b, c, d = (np.asarray(x, dtype=float) for x in (a, b, c, d))
+
+    d1  = b - a
+    d2  = d - c
+    d12 = c - a
+
+    D1  = np.einsum('ij,ij->i', d1, d1)
+    D2  = np.einsum('ij,ij->i', d2, d2)
+    S1  = np.einsum('ij,ij->i', d1, d12)
+    S2  = np.einsum('ij,ij->i', d2, d12)
+    R   = np.einsum('ij,ij->i', d1, d2)
+    den = D1 * D2 - R**2
+
+    t = np.zeros(len(a))
+    u = np.zeros(len(a))
+
+    # Masked-out entries may divide by zero; their results are discarded
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        # AB is a line segment and CD is a point
+        mask = (D1 != 0.) & (D2 == 0.)
+        t[mask] = np.clip(S1[mask] / D1[mask], 0., 1.)
+
+        # AB is a point and CD is a line segment
+        mask = (D1 == 0.) & (D2 != 0.)
+        u[mask] = np.clip(-S2[mask] / D2[mask], 0., 1.)
+
+        # Both are line segments, either parallel (t = 0) or in general position
+        segments = (D1 != 0.) & (D2 != 0.)
+        general = segments & (den != 0.)
+        t[general] = np.clip((S1[general] * D2[general] - S2[general] * R[general]) / den[general], 0., 1.)
+
+        u_segments = (t[segments] * R[segments] - S2[segments]) / D2[segments]
+        uf = np.clip(u_segments, 0., 1.)
+
+        # If the closest point on the line of CD is outside the segment, recompute t from the clamped u
+        clamped = uf != u_segments
+        t_segments = t[segments]
+        t_segments[clamped] = np.clip((uf[clamped] * R[segments][clamped] + S1[segments][clamped]) /
+                                      D1[segments][clamped], 0., 1.)
+        t[segments] = t_segments
+        u[segments] = uf
+
+    min_dist = np.linalg.norm(d1 * t[:, None] - d2 * u[:, None] - d12, axis=1)
+
+    min_dist_position = a + d1 * t[:, None]
+
+    return min_dist, min_dist_position
+
+
 def calculate_intermediate_y_position(a:     np.ndarray,
                                       b:     np.ndarray,
                                       x_int: float) -> float:
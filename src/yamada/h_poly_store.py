@@ -0,0 +1,225 @@
+"""H polynomial store
+
+A persistent table of H polynomials shared across runs and processes.
+
+Every process starts h_poly with an empty cache, so each worker of a multiprocessing pool would otherwise relearn the
+polynomials of the same small graphs. An HPolyStore keeps those polynomials in an SQLite database keyed by the
+canonical forms of the graphs (see yamada.H_polynomial.canonical_form). The database uses write-ahead logging, so any
+number of processes may read it while a single process writes to it.
+
+A process warm-starts by preloading the store into its HPolyCache, e.g. as the initializer of a pool:
+
+    pool = multiprocessing.Pool(initializer=preload_h_poly_cache, initargs=('h_poly.sqlite',))
+
+The store may be filled with the polynomials of every connected multigraph up to a given number of edges by
+
+    python -m yamada.h_poly_store h_poly.sqlite --max-edges 8
+"""
+
+import argparse
+import sqlite3
+import networkx as nx
+from yamada.H_polynomial import h_poly, canonical_form, H_poly_cache
+from yamada.laurent_polynomials import LaurentPolynomial
+
+
+def _encode_key(key):
+    num_vertices, edges = key
+    return '%d:' % num_vertices + ','.join('%d-%d' % edge for edge in edges)
+
+
+def _decode_key(text):
+    num_vertices, edges = text.split(':')
+    edges = tuple(tuple(int(v) for v in edge.split('-')) for edge in edges.split(',')) if edges else ()
+    return int(num_vertices), edges
+
+
+def _encode_poly(poly):
+    return ','.join(str(c) for c in poly)
+
+
+def _decode_poly(min_exponent, text):
+    return LaurentPolynomial([int(c) for c in text.split(',')] if text else [], min_exponent)
+
+
+class HPolyStore:
+    """
+    An SQLite table of H polynomials keyed by canonical graph forms.
+
+    Stores opened with readonly=True never write and may be used by any number of concurrent processes. Writes from a
+    read-write store are committed in batches by put_many (or once per put), each in its own transaction.
+    """
+
+    def __init__(self, path, readonly=False, timeout=60.0):
+        """
+        :param path: The path of the database file. It is created unless the store is read-only.
+        :param readonly: Open the database read-only.
+        :param timeout: Seconds to wait for the write lock held by another process.
+        """
+
+        self.path = path
+        self.readonly = readonly
+
+        if readonly:
+            self._connection = sqlite3.connect('file:%s?mode=ro' % path, uri=True, timeout=timeout)
+        else:
+            self._connection = sqlite3.connect(path, timeout=timeout)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS h_poly '
+                                     '(graph TEXT PRIMARY KEY, min_exponent INTEGER, coefficients TEXT)')
+            self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM h_poly').fetchone()[0]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key, default=None):
+        """
+        Returns the H polynomial of the graph with the given canonical form, or default if it is not stored.
+        """
+
+        row = self._connection.execute('SELECT min_exponent, coefficients FROM h_poly WHERE graph = ?',
+                                       (_encode_key(key),)).fetchone()
+        if row is None:
+            return default
+        return _decode_poly(*row)
+
+    def put(self, key, poly):
+        """
+        Stores the H polynomial of the graph with the given canonical form.
+        """
+
+        self.put_many([(key, poly)])
+
+    def put_many(self, items):
+        """
+        Stores (canonical form, H polynomial) pairs in a single transaction.
+        """
+
+        if self.readonly:
+            raise ValueError('The store is read-only.')
+
+        rows = [(_encode_key(key), poly.min_exponent, _encode_poly(poly)) for key, poly in items]
+        with self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO h_poly VALUES (?, ?, ?)', rows)
+
+    def items(self):
+        """
+        Generates the stored (canonical form, H polynomial) pairs.
+        """
+
+        for graph, min_exponent, coefficients in self._connection.execute('SELECT * FROM h_poly'):
+            yield _decode_key(graph), _decode_poly(min_exponent, coefficients)
+
+    def preload(self, cache=H_poly_cache):
+        """
+        Copies the stored polynomials into an HPolyCache (subject to its bounds) and returns the number copied.
+        """
+
+        count = 0
+        for key, poly in self.items():
+            cache.set(key, poly)
+            count += 1
+        return count
+
+    def save(self, cache=H_poly_cache):
+        """
+        Writes the polynomials of the unweighted graphs held by an HPolyCache to the store.
+        """
+
+        self.put_many([(key, poly) for key, poly in cache.items() if all(len(edge) == 2 for edge in key[1])])
+
+
+def preload_h_poly_cache(path, cache=H_poly_cache):
+    """
+    Preloads the default (or given) HPolyCache from the store at path. Suitable as a pool initializer.
+    """
+
+    with HPolyStore(path, readonly=True) as store:
+        return store.preload(cache)
+
+
+def connected_multigraphs(max_edges):
+    """
+    Generates the canonical forms of the connected multigraphs (with loops) with 1 to max_edges edges.
+
+    Each graph with m + 1 edges is obtained from one with m edges by adding an edge between two existing vertices
+    (possibly a loop) or a pendant edge to a new vertex, since every connected graph has an edge whose removal leaves
+    a connected graph or an isolated vertex. Isomorphic graphs are merged by their canonical forms.
+    """
+
+    level = {canonical_form(nx.MultiGraph([(0, 0)]))}
+    level.add(canonical_form(nx.MultiGraph([(0, 1)])))
+
+    for num_edges in range(1, max_edges + 1):
+        yield from sorted(level)
+        if num_edges == max_edges:
+            return
+
+        next_level = set()
+        for num_vertices, edges in level:
+            G = nx.MultiGraph()
+            G.add_nodes_from(range(num_vertices))
+            G.add_edges_from(edges)
+            for u in range(num_vertices):
+                for v in range(u, num_vertices + 1):
+                    G.add_edge(u, v)
+                    next_level.add(canonical_form(G))
+                    G.remove_edge(u, v)
+                    if v == num_vertices:
+                        G.remove_node(v)
+        level = next_level
+
+
+def precompute(store, max_edges, batch_size=1000):
+    """
+    Stores the H polynomials of every connected multigraph with at most max_edges edges that is not already in the
+    store, and returns the number of polynomials computed.
+    """
+
+    count = 0
+    batch = []
+
+    for key in connected_multigraphs(max_edges):
+        if key in store:
+            continue
+
+        num_vertices, edges = key
+        G = nx.MultiGraph()
+        G.add_nodes_from(range(num_vertices))
+        G.add_edges_from(edges)
+
+        batch.append((key, h_poly(G)))
+        count += 1
+        if len(batch) >= batch_size:
+            store.put_many(batch)
+            batch = []
+
+    store.put_many(batch)
+    return count
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Precompute the H polynomials of small connected multigraphs.')
+    parser.add_argument('path', help='the SQLite database to create or extend')
+    parser.add_argument('--max-edges', type=int, default=6, help='the maximum number of edges (default 6)')
+    args = parser.parse_args(args)
+
+    with HPolyStore(args.path) as store:
+        count = precompute(store, args.max_edges)
+        print('Computed %d H polynomials; the store holds %d.' % (count, len(store)))
+
+
+if __name__ == '__main__':
+    main()
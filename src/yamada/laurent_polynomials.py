@@ -0,0 +1,294 @@
+"""Laurent polynomials
+
+A compact Laurent polynomial type for the H and Yamada polynomial calculations.
+
+Yamada and H polynomials are Laurent polynomials in A with integer coefficients. Rather than performing every
+operation through cypari, a LaurentPolynomial stores its coefficients in a NumPy array (int64, or Python integer
+objects when the coefficients could overflow) together with the exponent of the first coefficient. Addition,
+multiplication, and multiplication by powers of A are then vectorized array operations, and the polynomial may be
+converted to and from pari exactly for display or further symbolic work.
+"""
+
+import sys
+import numpy as np
+from cypari import pari
+
+
+_PariGen = type(pari(0))
+
+# Coefficients are kept as int64 as long as every result is guaranteed to stay below this bound
+_INT64_BOUND = 2 ** 62
+
+
+def _bound(coefficients):
+    """
+    Returns an upper bound on the absolute value of the coefficients.
+    """
+
+    if len(coefficients) == 0:
+        return 0
+    return max(abs(int(coefficients.max())), abs(int(coefficients.min())))
+
+
+class LaurentPolynomial:
+    """
+    A Laurent polynomial in A with integer coefficients.
+
+    The polynomial is sum(coefficients[k] * A ** (min_exponent + k)). Coefficient arrays are trimmed so that the first
+    and last coefficients are nonzero; the zero polynomial has no coefficients.
+
+    Instances are immutable and hashable, so they may be used as dictionary keys. They compare equal to integers and
+    to pari objects representing the same polynomial.
+    """
+
+    __slots__ = ('coefficients', 'min_exponent')
+
+    def __init__(self, coefficients, min_exponent=0):
+        """
+        :param coefficients: The coefficients of A ** min_exponent, A ** (min_exponent + 1), ...
+        :param min_exponent: The exponent of the first coefficient.
+        """
+
+        coefficients = np.asarray(coefficients)
+
+        if coefficients.dtype != object:
+            coefficients = coefficients.astype(np.int64, copy=False)
+        elif _bound(coefficients) < _INT64_BOUND:
+            coefficients = coefficients.astype(np.int64)
+
+        nonzero = np.flatnonzero(coefficients)
+
+        if len(nonzero) == 0:
+            coefficients = coefficients[:0]
+            min_exponent = 0
+        else:
+            first, last = nonzero[0], nonzero[-1]
+            coefficients = coefficients[first:last + 1]
+            min_exponent += int(first)
+
+        coefficients.flags.writeable = False
+
+        self.coefficients = coefficients
+        self.min_exponent = min_exponent
+
+    @classmethod
+    def monomial(cls, exponent=1, coefficient=1):
+        """
+        Returns coefficient * A ** exponent.
+        """
+
+        return cls([coefficient], exponent)
+
+    @classmethod
+    def from_pari(cls, poly):
+        """
+        Converts a pari Laurent polynomial (or integer) in A to a LaurentPolynomial.
+        """
+
+        poly = pari(poly)
+
+        if poly == 0:
+            return cls([])
+
+        A = pari('A')
+        valuation = int(poly.valuation(A))
+        coefficients = [int(c) for c in (poly * A ** -valuation).Vec()]
+
+        return cls(coefficients[::-1], valuation)
+
+    def to_pari(self):
+        """
+        Converts the polynomial to a pari object.
+        """
+
+        if self.is_zero():
+            return pari(0)
+
+        A = pari('A')
+        coefficients = [int(c) for c in self.coefficients[::-1]]
+
+        return pari.Pol(coefficients, 'A') * A ** self.min_exponent
+
+    def _pari_(self):
+        return self.to_pari()
+
+    @property
+    def max_exponent(self):
+        return self.min_exponent + len(self.coefficients) - 1
+
+    @property
+    def exponents(self):
+        return range(self.min_exponent, self.max_exponent + 1)
+
+    def is_zero(self):
+        return len(self.coefficients) == 0
+
+    def shift(self, exponent):
+        """
+        Returns the polynomial multiplied by A ** exponent.
+        """
+
+        if self.is_zero():
+            return self
+
+        return LaurentPolynomial(self.coefficients, self.min_exponent + exponent)
+
+    def reverse(self):
+        """
+        Returns the polynomial with A replaced by A^(-1).
+        """
+
+        if self.is_zero():
+            return self
+
+        return LaurentPolynomial(self.coefficients[::-1], -self.max_exponent)
+
+    def normalize(self):
+        """
+        Returns the normalized Yamada polynomial, which is invariant under mirror images and the multiplication by
+        (-A)^n that Reidemeister moves may introduce.
+
+        The polynomial and its reverse are multiplied by the power of -A that makes their lowest exponent zero, and the
+        one whose coefficients are lexicographically smaller (from the constant term upwards) is returned.
+        """
+
+        a, b = self.min_exponent, self.max_exponent
+
+        forward = self.coefficients * (-1) ** (a % 2)
+        backward = self.coefficients[::-1] * (-1) ** (b % 2)
+
+        if [int(c) for c in backward] < [int(c) for c in forward]:
+            return LaurentPolynomial(backward)
+        return LaurentPolynomial(forward)
+
+    def __len__(self):
+        return len(self.coefficients)
+
+    def __iter__(self):
+        return (int(c) for c in self.coefficients)
+
+    def __neg__(self):
+        return LaurentPolynomial(-self.coefficients, self.min_exponent)
+
+    def __add__(self, other):
+
+        other = _as_laurent_polynomial(other)
+        if other is NotImplemented:
+            return other
+
+        if self.is_zero():
+            return other
+        if other.is_zero():
+            return self
+
+        min_exponent = min(self.min_exponent, other.min_exponent)
+        max_exponent = max(self.max_exponent, other.max_exponent)
+
+        if _bound(self.coefficients) + _bound(other.coefficients) < _INT64_BOUND:
+            dtype = np.int64
+        else:
+            dtype = object
+
+        coefficients = np.zeros(max_exponent - min_exponent + 1, dtype=dtype)
+        for poly in [self, other]:
+            start = poly.min_exponent - min_exponent
+            coefficients[start:start + len(poly.coefficients)] += poly.coefficients
+
+        return LaurentPolynomial(coefficients, min_exponent)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+
+        other = _as_laurent_polynomial(other)
+        if other is NotImplemented:
+            return other
+
+        return self + (-other)
+
+    def __rsub__(self, other):
+        return (-self) + other
+
+    def __mul__(self, other):
+
+        other = _as_laurent_polynomial(other)
+        if other is NotImplemented:
+            return other
+
+        if self.is_zero() or other.is_zero():
+            return LaurentPolynomial([])
+
+        a, b = self.coefficients, other.coefficients
+
+        if _bound(a) * _bound(b) * min(len(a), len(b)) >= _INT64_BOUND:
+            a, b = a.astype(object), b.astype(object)
+
+        return LaurentPolynomial(np.convolve(a, b), self.min_exponent + other.min_exponent)
+
+    __rmul__ = __mul__
+
+    def __pow__(self, exponent):
+
+        if exponent < 0:
+            if len(self.coefficients) != 1 or abs(int(self.coefficients[0])) != 1:
+                raise ValueError('Only monomials with unit coefficients may be raised to negative powers.')
+            return LaurentPolynomial.monomial(self.min_exponent * exponent, int(self.coefficients[0]) ** -exponent)
+
+        ans = LaurentPolynomial([1])
+        square = self
+        while exponent:
+            if exponent & 1:
+                ans = ans * square
+            exponent >>= 1
+            if exponent:
+                square = square * square
+
+        return ans
+
+    def __eq__(self, other):
+
+        if not isinstance(other, LaurentPolynomial):
+            try:
+                other = _as_laurent_polynomial(other)
+            except (TypeError, ValueError):
+                return NotImplemented
+            if other is NotImplemented:
+                return other
+
+        return self.min_exponent == other.min_exponent and np.array_equal(self.coefficients, other.coefficients)
+
+    def __hash__(self):
+
+        # Constants hash like the integers they are equal to
+        if self.min_exponent == 0 and len(self.coefficients) <= 1:
+            return hash(sum(self))
+
+        return hash((self.min_exponent, tuple(self)))
+
+    def __repr__(self):
+        return repr(self.to_pari())
+
+    def __str__(self):
+        return str(self.to_pari())
+
+    def __sizeof__(self):
+        # The array header plus its data, which may be a view onto another polynomial's coefficients
+        return object.__sizeof__(self) + sys.getsizeof(self.coefficients[:0]) + self.coefficients.nbytes
+
+    def __reduce__(self):
+        return LaurentPolynomial, (list(self), self.min_exponent)
+
+
+def _as_laurent_polynomial(other):
+    """
+    Converts integers and pari objects to LaurentPolynomials for arithmetic and comparisons.
+    """
+
+    if isinstance(other, LaurentPolynomial):
+        return other
+    elif isinstance(other, (int, np.integer)):
+        return LaurentPolynomial([int(other)])
+    elif isinstance(other, _PariGen):
+        return LaurentPolynomial.from_pari(other)
+    else:
+        return NotImplemented
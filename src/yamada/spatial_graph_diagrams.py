@@ -44,13 +44,29 @@ rather than directly calculate Yamada polynomials in this script (you'll get err
 """
 
 import networkx as nx
+import collections
+import concurrent.futures
+import functools
 import pickle
-from cypari import pari
-from yamada.H_polynomial import h_poly
-from yamada.utilities import get_coefficients_and_exponents
+import threading
+from yamada.H_polynomial import h_poly, H_poly_cache
+from yamada.caches import BoundedCache, HPolyCache
+from yamada.laurent_polynomials import LaurentPolynomial, _as_laurent_polynomial
+from yamada.state_sums import yamada_state_sum
 from yamada.diagram_elements import Vertex, Edge, Crossing
 
 
+# Actions recorded in undo logs
+_ADDED, _REMOVED, _CONNECTED = range(3)
+
+# Memo of non-normalized Yamada polynomials keyed by canonical diagram code. It is shared by every diagram so that
+# sub-diagrams repeated across the diagrams of an enumeration run are only computed once.
+yamada_polynomial_cache = BoundedCache(max_entries=100000)
+
+# Caches of the worker threads of thread pools, since the caches are not thread-safe
+_thread_caches = threading.local()
+
+
 class SpatialGraphDiagram:
     """
 
@@ -202,10 +218,9 @@ class SpatialGraphDiagram:
                 self.vertices.remove(vertex)
                 self.data.pop(vertex.label)
 
-    def add_vertex(self, vertex):
+    def add_vertex(self, vertex, log=None):
         """Adds a vertex to the diagram."""
-        self.vertices.append(vertex)
-        self.data[vertex.label] = vertex
+        self._add_part(self.vertices, vertex, log)
 
 
     def add_edge(self, E, A, i, B, j):
@@ -219,15 +234,76 @@ class SpatialGraphDiagram:
         self.edges.append(E)
         self.data[E.label] = E
 
-    def remove_edge(self, edge):
+    def remove_edge(self, edge, log=None):
         """Removes an edge from the diagram."""
-        self.edges.remove(edge)
-        self.data.pop(edge.label)
+        self._remove_part(self.edges, edge, log)
 
-    def remove_crossing(self, crossing):
+    def remove_crossing(self, crossing, log=None):
         """Removes a crossing from the diagram."""
-        self.crossings.remove(crossing)
-        self.data.pop(crossing.label)
+        self._remove_part(self.crossings, crossing, log)
+
+    def _add_part(self, parts, part, log=None):
+        """
+        Appends a vertex, crossing, or edge to the given list of parts, recording the change in the undo log (if any).
+        """
+
+        if log is not None:
+            log.append((_ADDED, parts, part, self.data.get(part.label)))
+
+        parts.append(part)
+        self.data[part.label] = part
+
+    def _remove_part(self, parts, part, log=None):
+        """
+        Removes a vertex, crossing, or edge from the given list of parts, recording the change in the undo log (if any).
+        """
+
+        if log is None:
+            parts.remove(part)
+        else:
+            index = parts.index(part)
+            del parts[index]
+            log.append((_REMOVED, parts, part, index))
+
+        self.data.pop(part.label)
+
+    def _connect(self, A, i, B, j, log=None):
+        """
+        Connects input i of A to input j of B, recording their previous connections in the undo log (if any).
+        """
+
+        if log is not None:
+            i, j = i % A.degree, j % B.degree
+            log.append((_CONNECTED, A, i, A.adjacent[i], B, j, B.adjacent[j]))
+
+        A[i] = B[j]
+
+    def undo(self, log):
+        """
+        Reverts the changes recorded in the undo log, most recent first, and empties the log.
+        """
+
+        while len(log):
+            entry = log.pop()
+            action = entry[0]
+
+            if action == _CONNECTED:
+                _, A, i, A_adjacent, B, j, B_adjacent = entry
+                B.adjacent[j] = B_adjacent
+                A.adjacent[i] = A_adjacent
+
+            elif action == _REMOVED:
+                _, parts, part, index = entry
+                parts.insert(index, part)
+                self.data[part.label] = part
+
+            else:
+                _, parts, part, replaced = entry
+                parts.pop()
+                if replaced is None:
+                    self.data.pop(part.label)
+                else:
+                    self.data[part.label] = replaced
 
     def connect_edges(self, edge_1, edge_1_index_1, edge_2, edge_2_index_1):
         """
@@ -279,7 +355,7 @@ class SpatialGraphDiagram:
 
 
 
-    def short_cut(self, crossing, i0):
+    def short_cut(self, crossing, i0, log=None):
         """
         Short-cuts a crossing by removing the edge between them.
         """
@@ -287,16 +363,162 @@ class SpatialGraphDiagram:
         i1 = (i0 + 1) % 4
         E0, j0 = crossing.adjacent[i0]
         E1, j1 = crossing.adjacent[i1]
+        self._splice(E0, j0, E1, j1, log)
+
+    def _splice(self, E0, j0, E1, j1, log=None):
+        """
+        Joins end j0 of edge E0 to end j1 of edge E1, whose previous attachments have been removed, by fusing the two
+        edges (or closing the edge with a 2-valent vertex if they are the same edge).
+        """
+
         if E0 == E1:
             V0 = Vertex(2, repr(E0) + '_stopper')
-            self.add_vertex(V0)
-            V0[0] = E0[j0]
-            V0[1] = E1[j1]
+            self.add_vertex(V0, log)
+            self._connect(V0, 0, E0, j0, log)
+            self._connect(V0, 1, E1, j1, log)
+        else:
+            self._connect(E1, j1, E0, j0, log)
+
+            # Fuse E1 (see Edge.fuse)
+            (A, i), (B, j) = E1.adjacent
+            self._connect(A, i, B, j, log)
+            self.remove_edge(E1, log)
+
+    def resolve_crossing(self, crossing, resolution, log=None):
+        """
+        Replaces a crossing by one of the three diagrams of the Yamada skein relation.
+
+        :param crossing: The crossing to resolve.
+        :param resolution: 'plus' and 'minus' short-cut the crossing (S_plus and S_minus), whereas 'zero' smushes it
+            into a 4-valent vertex (S_0).
+        :param log: An undo log (list) to record the changes in, so that they may be reverted with undo().
+        """
+
+        self.remove_crossing(crossing, log)
+
+        if resolution == 'plus':
+            self.short_cut(crossing, 0, log)
+            self.short_cut(crossing, 2, log)
+
+        elif resolution == 'minus':
+            self.short_cut(crossing, 1, log)
+            self.short_cut(crossing, 3, log)
+
+        elif resolution == 'zero':
+            V = Vertex(4, repr(crossing) + '_smushed')
+            self.add_vertex(V, log)
+            for i in range(4):
+                B, j = crossing.adjacent[i]
+                self._connect(V, i, B, j, log)
+
         else:
-            E1[j1] = E0[j0]
-            E1.fuse()
-            self.remove_edge(E1)
+            raise ValueError("The resolution must be 'plus', 'minus', or 'zero'.")
+
+    def find_r1(self, crossing):
+        """
+        Returns an input i of the crossing such that an edge joins inputs i and i + 1, forming a kink that a Reidemeister
+        1 move removes, or None.
+        """
+
+        for i in range(4):
+            E, j = crossing.adjacent[i]
+            if E.adjacent[1 - j] == (crossing, (i + 1) % 4):
+                return i
+        return None
+
+    def remove_r1(self, crossing, i, log=None):
+        """
+        Removes the kink at inputs i and i + 1 of a crossing (see find_r1) with the resolution of the crossing that joins
+        the loop to the strand through it.
+
+        Returns the exponent e such that the Yamada polynomial of the diagram before the move is A^e times the one
+        after it: a kink at inputs 0-1 or 2-3 contributes A^2 and one at inputs 1-2 or 3-0 contributes A^(-2).
+        """
+
+        if i % 2 == 0:
+            self.resolve_crossing(crossing, 'minus', log)
+            return 2
+        else:
+            self.resolve_crossing(crossing, 'plus', log)
+            return -2
+
+    def find_r2(self, crossing):
+        """
+        Returns (other_crossing, a, b) such that edges join input a of the crossing to input b of the other crossing
+        and input a + 1 to input b - 1, bounding a bigon, and the strand through input a passes over (or under) both
+        crossings, so that a Reidemeister 2 move removes the two crossings. Returns None if there is no such pair.
+        """
+
+        for a in range(4):
+            E, j = crossing.adjacent[a]
+            other, b = E.adjacent[1 - j]
+            if not isinstance(other, Crossing) or other is crossing or a % 2 != b % 2:
+                continue
+
+            F, k = crossing.adjacent[(a + 1) % 4]
+            if F is not E and F.adjacent[1 - k] == (other, (b - 1) % 4):
+                return other, a, b
+
+        return None
+
+    def remove_r2(self, crossing, other, a, b, log=None):
+        """
+        Removes a pair of crossings with a Reidemeister 2 move (see find_r2). The Yamada polynomial is unchanged.
+        """
+
+        self.remove_crossing(crossing, log)
+        self.remove_crossing(other, log)
+        self.remove_edge(crossing.adjacent[a][0], log)
+        self.remove_edge(crossing.adjacent[(a + 1) % 4][0], log)
+
+        # Each splice updates the inputs of the removed crossings that the edges it fuses were attached to, so the
+        # second splice sees the result of the first even if an edge joins two of the outer inputs
+        self._splice(*crossing.adjacent[(a + 2) % 4], *other.adjacent[(b + 2) % 4], log)
+        self._splice(*crossing.adjacent[(a + 3) % 4], *other.adjacent[(b + 1) % 4], log)
+
+    def reidemeister_reduce(self, log=None, counts=None):
+        """
+        Applies Reidemeister 1 and 2 moves that remove crossings, in place, until there are none left.
+
+        Every crossing is checked once, and after each move only the crossings next to the removed ones are checked
+        again, since no other crossing's neighborhood has changed.
+
+        :param log: An undo log (list) to record the changes in, so that they may be reverted with undo().
+        :param counts: An optional dictionary in which the numbers of moves are accumulated under 'r1' and 'r2'.
+        :return: The exponent e such that the Yamada polynomial of the diagram before the moves is A^e times the one
+            after them.
+        """
 
+        if counts is not None:
+            for key in ['r1', 'r2']:
+                counts.setdefault(key, 0)
+
+        exponent = 0
+        worklist = list(self.crossings)
+
+        while len(worklist):
+            C = worklist.pop()
+            if self.data.get(C.label) is not C:
+                continue
+
+            i = self.find_r1(C)
+            if i is not None:
+                neighbors = _neighboring_crossings([C])
+                exponent += self.remove_r1(C, i, log)
+                move = 'r1'
+            else:
+                r2 = self.find_r2(C)
+                if r2 is None:
+                    continue
+                neighbors = _neighboring_crossings([C, r2[0]])
+                self.remove_r2(C, *r2, log)
+                move = 'r2'
+
+            if counts is not None:
+                counts[move] += 1
+            worklist.extend(neighbors)
+
+        return exponent
 
     def copy(self):
         """
@@ -361,92 +583,276 @@ class SpatialGraphDiagram:
         G.check_structure()
         return G
 
+    def canonical_code(self):
+        """
+        Returns a hashable code of the diagram that is invariant under relabeling and planar isotopy.
+
+        Each connected component is traversed breadth-first from every admissible starting entry point, numbering
+        vertices, crossings, and edges in the order they are reached and recording how they are attached in
+        anticlockwise order. The smallest traversal is the canonical code of the component. Crossings are recorded
+        with the parity of the input they were entered from so that over- and under-strands are not interchanged.
 
-    def yamada_polynomial(self, check_pieces=False):
+        Mirror images are (deliberately) not identified since they generally have different Yamada polynomials.
+        Disjoint components are independent for the Yamada polynomial, so the diagram code is the sorted tuple of
+        component codes.
         """
-        Return the non-normalized Yamada polynomial of the knot.
+
+        parts = self.vertices + self.crossings + self.edges
+
+        unvisited = set(parts)
+        component_codes = []
+
+        while len(unvisited):
+
+            # Collect the next connected component
+            start = unvisited.pop()
+            component = [start]
+            stack = [start]
+            while len(stack):
+                A = stack.pop()
+                for B, _ in A.adjacent:
+                    if B in unvisited:
+                        unvisited.remove(B)
+                        component.append(B)
+                        stack.append(B)
+
+            # Only start from the rarest kind of part so the set of starting points is isomorphism invariant
+            kinds = collections.Counter(_part_kind(A) for A in component if not isinstance(A, Edge))
+            start_kind = min(kinds, key=lambda kind: (kinds[kind], kind))
+            starts = [A for A in component if not isinstance(A, Edge) and _part_kind(A) == start_kind]
+
+            component_codes.append(min(_traversal_code(A, i) for A in starts for i in range(A.degree)))
+
+        return tuple(sorted(component_codes))
+
+
+    def skein_subproblems(self, levels):
         """
-        A = pari('A')
+        Expands the skein relation at the first levels crossings of the diagram.
+
+        Returns a list of (weight, diagram) pairs such that the Yamada polynomial of the diagram is the sum of the
+        weights times the Yamada polynomials of the diagrams. Each of the 3^levels resolutions of the crossings is
+        weighted by A^(#plus - #minus), and the weights of resolutions with the same canonical code are added, so the
+        diagrams are pairwise distinct. The diagrams are independent copies; this diagram is unchanged.
+        """
+
+        crossings = self.crossings[:levels]
+        subproblems = dict()
+
+        def resolve(k, exponent):
+            if k == len(crossings):
+                S = self.copy()
+                code = S.canonical_code()
+                weight, S = subproblems.get(code, (LaurentPolynomial([]), S))
+                subproblems[code] = (weight + LaurentPolynomial.monomial(exponent), S)
+                return
+
+            for resolution, change in [('plus', 1), ('minus', -1), ('zero', 0)]:
+                log = []
+                try:
+                    self.resolve_crossing(crossings[k], resolution, log)
+                    resolve(k + 1, exponent + change)
+                finally:
+                    self.undo(log)
+
+        resolve(0, 0)
+        return list(subproblems.values())
+
+    def yamada_polynomial(self, check_pieces=False, cache=yamada_polynomial_cache, in_place=True,
+                          h_poly_cache=H_poly_cache, pool=None, split_levels=2, simplify=False):
+        """
+        Return the non-normalized Yamada polynomial of the knot.
+
+        :param check_pieces: Check the validity of each intermediate diagram.
+        :param cache: A BoundedCache that memoizes the polynomials of (sub-)diagrams by their canonical code, or None
+            to disable memoization.
+        :param in_place: Resolve the crossings of this diagram in place and revert each resolution with an undo log,
+            rather than resolving serialized copies of the diagram. The diagram is unchanged upon return either way.
+        :param h_poly_cache: The HPolyCache used for the H polynomials of the projection graphs, or None.
+        :param pool: A process pool (or any executor with a map method) that evaluates the subproblems given by
+            skein_subproblems(split_levels) in parallel, or None to evaluate the whole skein tree in this process.
+            The workers are passed check_pieces, in_place, and simplify, but not cache and h_poly_cache: each worker
+            process uses its own default caches, and each worker thread its own private caches.
+        :param split_levels: The number of levels of the skein tree that are expanded into subproblems for the pool.
+        :param simplify: Remove the crossings that Reidemeister 1 and 2 moves can remove (see reidemeister_reduce),
+            accounting for their factors of A^(+-2), before each skein expansion.
+        """
+
+        if simplify:
+            log = []
+            try:
+                exponent = self.reidemeister_reduce(log)
+                if len(log):
+                    return self.yamada_polynomial(check_pieces, cache, in_place, h_poly_cache, pool, split_levels,
+                                                  simplify).shift(exponent)
+            finally:
+                self.undo(log)
 
         if len(self.crossings) == 0:
-            return h_poly(self.projection_graph())
+            return h_poly(self.projection_graph(), h_poly_cache)
+
+        if cache is not None:
+            code = self.canonical_code()
+            ans = cache.get(code)
+            if ans is not None:
+                return ans
+
+        if pool is not None and split_levels > 0:
+            subproblems = self.skein_subproblems(split_levels)
+            worker = functools.partial(_yamada_polynomial, check_pieces=check_pieces, in_place=in_place,
+                                       simplify=simplify)
+            polys = pool.map(worker, [S for _, S in subproblems])
+            ans = sum((weight * Y for (weight, _), Y in zip(subproblems, polys)), LaurentPolynomial([]))
+
+            if cache is not None:
+                cache.set(code, ans)
+
+            return ans
 
         C = self.crossings[0]
         c = C.label
 
-        # S_plus
-        S_plus = self.copy()
-        C_plus = S_plus.data[c]
-        S_plus.remove_crossing(C_plus)
-        S_plus.short_cut(C_plus, 0)
-        S_plus.short_cut(C_plus, 2)
-        if check_pieces:
-            S_plus._check()
-
-        # S_minus
-        S_minus = self.copy()
-        C_minus = S_minus.data[c]
-        S_minus.remove_crossing(C_minus)
-        S_minus.short_cut(C_minus, 1)
-        S_minus.short_cut(C_minus, 3)
-        if check_pieces:
-            S_minus._check()
-
-        # S_0
-        S_0 = self.copy()
-        C_0 = S_0.data[c]
-        S_0.remove_crossing(C_0)
-
-        V = Vertex(4, repr(C_0) + '_smushed')
-        S_0.add_vertex(V)
-
-        # Clean up the diagram
-        # self._merge_vertices()
+        Y = {}
+        for resolution in ['plus', 'minus', 'zero']:
 
-        for i in range(4):
-            B, j = C_0.adjacent[i]
-            V[i] = B[j]
+            if in_place:
+                log = []
+                try:
+                    self.resolve_crossing(C, resolution, log)
+                    if check_pieces:
+                        self._check()
+                    Y[resolution] = self.yamada_polynomial(cache=cache, in_place=in_place,
+                                                           h_poly_cache=h_poly_cache, simplify=simplify)
+                finally:
+                    self.undo(log)
 
-        if check_pieces:
-            S_0._check()
+            else:
+                S = self.copy()
+                S.resolve_crossing(S.data[c], resolution)
+                if check_pieces:
+                    S._check()
+                Y[resolution] = S.yamada_polynomial(cache=cache, in_place=in_place, h_poly_cache=h_poly_cache,
+                                                    simplify=simplify)
 
-        Y_plus  = S_plus.yamada_polynomial()
-        Y_minus = S_minus.yamada_polynomial()
-        Y_0     = S_0.yamada_polynomial()
+        ans = Y['plus'].shift(1) + Y['minus'].shift(-1) + Y['zero']
 
-        return A * Y_plus + (A ** -1) * Y_minus + Y_0
+        if cache is not None:
+            cache.set(code, ans)
 
-    def normalized_yamada_polynomial(self):
-        """normalized_yamada_polynomial"""
+        return ans
 
-        yamada_polynomial = self.yamada_polynomial()
+    def normalized_yamada_polynomial(self, engine='recursive', pool=None, split_levels=2, simplify=False):
+        """
+        Returns the normalized Yamada polynomial of the diagram.
 
-        A = pari('A')
+        :param engine: 'recursive' evaluates the skein relation recursively (see yamada_polynomial), whereas
+            'state_sum' iterates over the resolution states of the crossings (see yamada.state_sums). Both give
+            identical results.
+        :param pool: A process pool that evaluates the top split_levels levels of the skein tree in parallel (with the
+            'recursive' engine only; see yamada_polynomial).
+        :param simplify: Apply Reidemeister reductions before each skein expansion (with the 'recursive' engine only;
+            see yamada_polynomial).
+        """
 
-        _, exps = get_coefficients_and_exponents(yamada_polynomial)
-        a, b = min(exps), max(exps)
-        ans1 = (-A) ** (-a) * yamada_polynomial
-        ans2 = (-A) ** b * reverse_poly(yamada_polynomial)
+        if engine == 'recursive':
+            yamada_polynomial = self.yamada_polynomial(pool=pool, split_levels=split_levels, simplify=simplify)
+        elif engine == 'state_sum':
+            yamada_polynomial = yamada_state_sum(self)
+        else:
+            raise ValueError("The engine must be 'recursive' or 'state_sum'.")
 
-        normalized_yamada_polynomial = min([ans1, ans2], key=list)
+        return yamada_polynomial.normalize()
 
-        return normalized_yamada_polynomial
 
+def _worker_caches():
+    """
+    Returns the caches used by pool workers: the default caches in the main thread of a process, and otherwise caches
+    with the same bounds that belong to the current thread.
+    """
 
-def normalize_yamada_polynomial(yamada_polynomial):
-    """normalized_yamada_polynomial
+    if threading.current_thread() is threading.main_thread():
+        return yamada_polynomial_cache, H_poly_cache
+
+    if not hasattr(_thread_caches, 'cache'):
+        _thread_caches.cache = BoundedCache(yamada_polynomial_cache.max_entries, yamada_polynomial_cache.max_bytes,
+                                            yamada_polynomial_cache.policy)
+        _thread_caches.h_poly_cache = HPolyCache(H_poly_cache.max_entries, H_poly_cache.max_bytes,
+                                                 H_poly_cache.policy)
+    return _thread_caches.cache, _thread_caches.h_poly_cache
+
+
+def _yamada_polynomial(diagram, check_pieces=False, in_place=True, simplify=False):
+    """
+    Returns the non-normalized Yamada polynomial of a diagram with the worker caches of the current process or thread.
+    """
+
+    cache, h_poly_cache = _worker_caches()
+    return diagram.yamada_polynomial(check_pieces=check_pieces, cache=cache, in_place=in_place,
+                                     h_poly_cache=h_poly_cache, simplify=simplify)
+
+
+def _neighboring_crossings(crossings):
+    """
+    Returns the crossings joined to the given ones by an edge, other than the given ones.
+    """
+
+    neighbors = []
+    for C in crossings:
+        for E, j in C.adjacent:
+            X = E.adjacent[1 - j][0]
+            if isinstance(X, Crossing) and X not in crossings:
+                neighbors.append(X)
+    return neighbors
+
+
+def _part_kind(part):
+    """
+    Returns a sortable description of the kind of vertex-like object used in canonical diagram codes.
     """
 
-    A = pari('A')
+    if isinstance(part, Crossing):
+        return 1, part.degree
+    elif isinstance(part, Edge):
+        return 2, part.degree
+    else:
+        return 0, part.degree
 
-    _, exps = get_coefficients_and_exponents(yamada_polynomial)
-    a, b = min(exps), max(exps)
-    ans1 = (-A) ** (-a) * yamada_polynomial
-    ans2 = (-A) ** b * reverse_poly(yamada_polynomial)
 
-    normalized_yamada_polynomial = min([ans1, ans2], key=list)
+def _traversal_code(start, start_index):
+    """
+    Returns the code of the breadth-first traversal of a diagram component that enters start at input start_index.
+
+    Every object is described by its kind, its degree, and (for crossings) the parity of the input it was entered
+    from, followed by the traversal number and relative input of each neighbor in anticlockwise order.
+    """
 
-    return normalized_yamada_polynomial
+    numbers = {start: 0}
+    offsets = {start: start_index}
+    queue = [start]
+    code = []
+
+    for A in queue:
+        offset = offsets[A]
+        kind, degree = _part_kind(A)
+        code += [kind, degree, offset % 2 if kind == 1 else 0]
+        for r in range(degree):
+            B, j = A.adjacent[(offset + r) % degree]
+            if B not in numbers:
+                numbers[B] = len(queue)
+                offsets[B] = j
+                queue.append(B)
+            code += [numbers[B], (j - offsets[B]) % B.degree]
+
+    return tuple(code)
+
+
+def normalize_yamada_polynomial(yamada_polynomial):
+    """normalized_yamada_polynomial
+
+    Accepts a LaurentPolynomial or a pari Laurent polynomial in A and returns a LaurentPolynomial.
+    """
+
+    return _as_laurent_polynomial(yamada_polynomial).normalize()
 
 
 def reverse_poly(poly):
@@ -454,15 +860,60 @@ def reverse_poly(poly):
     TODO Why does reverse_poly invert the exponent? What is the purpose?
     """
 
-    A = pari('A')
+    return _as_laurent_polynomial(poly).reverse()
+
 
-    coeffs, exps = get_coefficients_and_exponents(poly)
 
-    ans = pari(0)
 
-    for c, e in zip(coeffs, exps):
-        ans += c * A ** (-e)
+def _batch_polynomial(args):
+    group, diagram, normalized = args
+    poly = _yamada_polynomial(diagram)
+    if normalized:
+        poly = poly.normalize()
+    return group, poly
 
-    return ans
 
+def yamada_polynomials(diagrams, normalized=True, executor=None, chunksize=1, cache=yamada_polynomial_cache,
+                       h_poly_cache=H_poly_cache):
+    """
+    Generates (index, polynomial) pairs for the diagrams of an iterable, evaluating each distinct diagram only once.
+
+    The diagrams are grouped by their canonical codes up front, and the polynomial of the first diagram of each group
+    is reported for the index of every diagram in the group.
+
+    :param diagrams: An iterable of SpatialGraphDiagrams.
+    :param normalized: Generate normalized (rather than non-normalized) Yamada polynomials.
+    :param executor: None to evaluate the diagrams in this process in order, sharing the given caches across the
+        batch. Otherwise a concurrent.futures.Executor or a multiprocessing pool (of processes or threads), in which
+        case the pairs are generated as the evaluations complete. The caches are not thread-safe, so each worker keeps
+        its own caches between the diagrams it evaluates: the default caches of a worker process, or caches private
+        to a worker thread.
+    :param chunksize: The number of diagrams sent to a multiprocessing pool at a time.
+    :param cache: The BoundedCache of sub-diagram polynomials used without an executor, or None.
+    :param h_poly_cache: The HPolyCache used without an executor, or None.
+    """
 
+    groups = dict()
+    for index, D in enumerate(diagrams):
+        groups.setdefault(D.canonical_code(), (D, []))[1].append(index)
+    groups = list(groups.values())
+
+    if executor is None:
+        for D, indices in groups:
+            poly = D.yamada_polynomial(cache=cache, h_poly_cache=h_poly_cache)
+            if normalized:
+                poly = poly.normalize()
+            for index in indices:
+                yield index, poly
+        return
+
+    tasks = [(group, D, normalized) for group, (D, _) in enumerate(groups)]
+    if hasattr(executor, 'imap_unordered'):
+        results = executor.imap_unordered(_batch_polynomial, tasks, chunksize)
+    else:
+        results = (future.result() for future in
+                   concurrent.futures.as_completed([executor.submit(_batch_polynomial, task) for task in tasks]))
+
+    for group, poly in results:
+        for index in groups[group][1]:
+            yield index, poly
@@ -3,6 +3,7 @@
 This module contains classes and functions for working with spatial graphs.
 """
 
+import collections
 import numpy as np
 
 from itertools import combinations
@@ -10,7 +11,7 @@ import pyvista as pv
 import matplotlib.colors as mcolors
 import random
 
-from .geometry import rotate, get_line_segment_intersection, calculate_intermediate_y_position, calculate_counter_clockwise_angle
+from .geometry import rotate, get_line_segment_intersections, calculate_intermediate_y_position, calculate_counter_clockwise_angle
 
 from yamada.diagram_elements import Vertex, Crossing
 from yamada.spatial_graph_diagrams import SpatialGraphDiagram
@@ -38,9 +39,15 @@ class SpatialGraph:
         # self.nodes = self._validate_nodes(nodes)
         # self.edges = self._validate_edges(edges)
 
-        self.adjacent_edge_pairs = self._get_adjacent_edge_pairs()
-        self.nonadjacent_edge_pairs = [edge_pair for edge_pair in self.edge_pairs if
-                                       edge_pair not in self.adjacent_edge_pairs]
+        # Integer indices of the nodes, the node indices of the edge endpoints, and the incidences in CSR form
+        self.node_indices = {node: i for i, node in enumerate(nodes)}
+        self.edge_ends = np.array([[self.node_indices[u], self.node_indices[v]] for u, v in edges],
+                                  dtype=int).reshape(-1, 2)
+        self.incidence_offsets, self.incident_edges, self.incident_nodes = self._get_incidences()
+
+        # The nonadjacent edge pairs are generated on demand, since all but a few of them are far apart
+        self.adjacent_edge_indices = self._get_adjacent_edge_indices()
+        self.adjacent_edge_pairs = [(self.edges[i], self.edges[j]) for i, j in self.adjacent_edge_indices]
 
         # Temporarily convert node positions to array
         node_positions_list = [node_positions[node] for node in nodes]
@@ -50,13 +57,12 @@ class SpatialGraph:
         # self.node_positions = self._validate_node_positions(node_positions)
 
         # Project the spatial graph onto a random the xz-plane
-        self.node_positions_3d = self.project(node_positions, initial_rotation=projection_rotation)
+        self._set_projection(self.project(node_positions, initial_rotation=projection_rotation))
         self.node_positions_dict_3d = {node: position for node, position in zip(nodes, node_positions)}
 
-        self.node_positions_2d = self.node_positions_3d[:, [0, 2]]
-        self.node_positions_dict_2d = {node: position for node, position in zip(nodes, self.node_positions_2d)}
-
-        self.crossings, self.crossing_positions, self.crossing_edge_pairs = self.get_crossings()
+        # The crossings by the index pairs (i, j), i < j, of the edges that form them
+        self.crossing_pairs = self._find_crossings(self._candidate_edge_pairs())
+        self._index_crossings()
 
     @staticmethod
     def _validate_nodes(nodes: list[str]) -> list[str]:
@@ -129,41 +135,110 @@ class SpatialGraph:
 
         The node degree is the number of edges that are incident to the node.
         """
-        return len([edge for edge in self.edges if node in edge])
+
+        if node not in self.node_indices:
+            return 0
+
+        return len(self._incident_slice(self.node_indices[node])[0])
 
     def get_adjacent_nodes(self, reference_node: str) -> list[str]:
         """
         Get the adjacent nodes to a given node.
         """
 
-        adjacent_nodes = []
+        if reference_node not in self.node_indices:
+            return []
 
-        for edge in self.edges:
-            if reference_node == edge[0] or reference_node == edge[1]:
-                adjacent_nodes += [node for node in edge if node != reference_node]
+        i = self.node_indices[reference_node]
+        _, incident_nodes = self._incident_slice(i)
 
-        return adjacent_nodes
+        # Loops do not contribute adjacent nodes
+        return [self.nodes[k] for k in incident_nodes if k != i]
 
     @property
     def edge_pairs(self):
         return list(combinations(self.edges, 2))
 
-    def _get_adjacent_edge_pairs(self):
+    @property
+    def nonadjacent_edge_pairs(self):
+        return list(self.iter_nonadjacent_edge_pairs())
 
-        adjacent_edge_pairs = []
+    def iter_nonadjacent_edge_pairs(self):
+        """
+        Generates the pairs of edges that do not share a node, in the order of edge_pairs.
+        """
 
-        for edge_1, edge_2 in self.edge_pairs:
+        adjacent = set(map(tuple, self.adjacent_edge_indices.tolist()))
+        for i, j in combinations(range(len(self.edges)), 2):
+            if (i, j) not in adjacent:
+                yield self.edges[i], self.edges[j]
 
-            a, b = edge_1
-            c, d = edge_2
+    def _get_incidences(self):
+        """
+        Returns the incidences of the nodes in CSR form: the edges incident to the node with index i are
+        incident_edges[offsets[i]:offsets[i + 1]], in ascending order, and incident_nodes holds the other endpoints of
+        those edges. A loop is incident to its node twice.
+        """
+
+        ends = self.edge_ends.ravel()
+        order = np.argsort(ends, kind='stable')
+
+        offsets = np.zeros(len(self.nodes) + 1, dtype=int)
+        np.cumsum(np.bincount(ends, minlength=len(self.nodes)), out=offsets[1:])
+
+        incident_edges = order // 2
+        incident_nodes = self.edge_ends[incident_edges, 1 - order % 2]
+
+        return offsets, incident_edges, incident_nodes
 
-            assertion_1 = a in [c, d]
-            assertion_2 = b in [c, d]
+    def _incident_slice(self, i):
+        """
+        Returns the distinct edges incident to the node with index i and their other endpoints, in ascending order.
+        """
+
+        start, stop = self.incidence_offsets[i], self.incidence_offsets[i + 1]
+        incident_edges, incident_nodes = self.incident_edges[start:stop], self.incident_nodes[start:stop]
 
-            if assertion_1 or assertion_2:
-                adjacent_edge_pairs += [(edge_1, edge_2)]
+        # A loop is listed twice
+        keep = np.ones(len(incident_edges), dtype=bool)
+        keep[1:] = incident_edges[1:] != incident_edges[:-1]
 
-        return adjacent_edge_pairs
+        return incident_edges[keep], incident_nodes[keep]
+
+    def _index_crossings(self):
+        """
+        Names the crossings of self.crossing_pairs in the order of their edge pairs, and indexes them by name and by
+        the edges they lie on.
+        """
+
+        self.crossing_pairs = dict(sorted(self.crossing_pairs.items()))
+
+        self.crossing_edge_indices = list(self.crossing_pairs)
+        self.crossings = ['crossing_' + str(k) for k in range(len(self.crossing_pairs))]
+        self.crossing_positions = [position for position, _ in self.crossing_pairs.values()]
+        self.crossing_edge_pairs = [edge_pair for _, edge_pair in self.crossing_pairs.values()]
+
+        self.crossing_indices = {crossing: k for k, crossing in enumerate(self.crossings)}
+
+        self.edge_crossing_indices = collections.defaultdict(list)
+        for k, edge_pair in enumerate(self.crossing_edge_pairs):
+            for edge in set(edge_pair):
+                self.edge_crossing_indices[edge].append(k)
+
+    def _get_adjacent_edge_indices(self):
+        """
+        Returns an (A, 2) array of the index pairs (i, j), i < j, of the edges that share a node, in lexicographic order.
+
+        Only the edges incident to a common node are paired, so the cost is the sum of the squared node degrees rather
+        than the square of the number of edges.
+        """
+
+        adjacent = set()
+        for i in range(len(self.nodes)):
+            incident_edges, _ = self._incident_slice(i)
+            adjacent.update(combinations(incident_edges.tolist(), 2))
+
+        return np.array(sorted(adjacent), dtype=int).reshape(-1, 2)
 
     def _validate_node_positions(self,
                                  node_positions: np.ndarray) -> np.ndarray:
@@ -214,13 +289,9 @@ class SpatialGraph:
         edge_node_positions = [self.node_positions_dict_2d[node] for node in edge_nodes]
 
         # Get crossing and positions (if applicable)
-        edge_crossings = []
-        edge_crossing_positions = []
-
-        for edge_pair, position, crossing in zip(self.crossing_edge_pairs, self.crossing_positions, self.crossings):
-            if reference_edge in edge_pair:
-                edge_crossings.append(crossing)
-                edge_crossing_positions.append(position)
+        crossing_indices = self.edge_crossing_indices.get(reference_edge, [])
+        edge_crossings = [self.crossings[i] for i in crossing_indices]
+        edge_crossing_positions = [self.crossing_positions[i] for i in crossing_indices]
 
         if len(edge_crossings) > 0:
             # Merge the vertices and crossings
@@ -379,12 +450,9 @@ class SpatialGraph:
         edge_node_positions = [self.node_positions_dict_2d[node] for node in edge_nodes]
 
         # Get crossing and positions (if applicable)
-        edge_crossings = []
-        edge_crossing_positions = []
-        for edge_pair, position, crossing in zip(self.crossing_edge_pairs, self.crossing_positions, self.crossings):
-            if edge in edge_pair:
-                edge_crossings.append(crossing)
-                edge_crossing_positions.append(position)
+        crossing_indices = self.edge_crossing_indices.get(edge, [])
+        edge_crossings = [self.crossings[i] for i in crossing_indices]
+        edge_crossing_positions = [self.crossing_positions[i] for i in crossing_indices]
 
         if len(edge_crossings) > 0:
             # Merge the vertices and crossings
@@ -418,11 +486,11 @@ class SpatialGraph:
         """
         Get the adjacent nodes to a given node.
         """
-        adjacent_nodes = self.get_adjacent_nodes(reference_node)
-
-        node_indices = [self.nodes.index(node) for node in adjacent_nodes]
+        i = self.node_indices[reference_node]
+        node_indices = self.incident_nodes[self.incidence_offsets[i]:self.incidence_offsets[i + 1]]
 
-        return self.node_positions_2d[node_indices]
+        # Loops do not contribute adjacent nodes
+        return self.node_positions_2d[node_indices[node_indices != i]]
 
     def cyclic_order_vertex(self,
                             reference_node:     str,
@@ -591,11 +659,11 @@ class SpatialGraph:
 
     def get_node_or_crossing_projected_position(self, reference_node: str) -> np.ndarray:
 
-        if reference_node in self.nodes:
+        if reference_node in self.node_indices:
             return self.node_positions_dict_2d[reference_node]
 
-        elif reference_node in self.crossings:
-            return self.crossing_positions[self.crossings.index(reference_node)]
+        elif reference_node in self.crossing_indices:
+            return self.crossing_positions[self.crossing_indices[reference_node]]
 
         else:
             raise ValueError("Node or crossing not found.")
@@ -620,7 +688,8 @@ class SpatialGraph:
 
         # Get the edges that are connected to the crossing
         # Assumption: get_edges_of_crossing returns the edges in the order of the nodes
-        edge_1, edge_2 = self.crossing_edge_pairs[self.crossings.index(crossing)]
+        crossing_index = self.crossing_indices[crossing]
+        edge_1, edge_2 = self.crossing_edge_pairs[crossing_index]
         edge_1_nodes_and_crossings = self.get_edge_vertices_and_or_crossings(edge_1)
         edge_2_nodes_and_crossings = self.get_edge_vertices_and_or_crossings(edge_2)
 
@@ -647,12 +716,12 @@ class SpatialGraph:
         edge_2_left_vertex  = edge_2_nodes_and_crossings[0]
         edge_2_right_vertex = edge_2_nodes_and_crossings[-1]
 
-        edge_1_left_vertex_position  = self.node_positions_3d[self.nodes.index(edge_1_left_vertex)]
-        edge_1_right_vertex_position = self.node_positions_3d[self.nodes.index(edge_1_right_vertex)]
-        edge_2_left_vertex_position  = self.node_positions_3d[self.nodes.index(edge_2_left_vertex)]
-        edge_2_right_vertex_position = self.node_positions_3d[self.nodes.index(edge_2_right_vertex)]
+        edge_1_left_vertex_position  = self.node_positions_3d[self.node_indices[edge_1_left_vertex]]
+        edge_1_right_vertex_position = self.node_positions_3d[self.node_indices[edge_1_right_vertex]]
+        edge_2_left_vertex_position  = self.node_positions_3d[self.node_indices[edge_2_left_vertex]]
+        edge_2_right_vertex_position = self.node_positions_3d[self.node_indices[edge_2_right_vertex]]
 
-        crossing_position = self.crossing_positions[self.crossings.index(crossing)]
+        crossing_position = self.crossing_positions[crossing_index]
 
         y_crossing_edge_1 = calculate_intermediate_y_position(edge_1_left_vertex_position,
                                                                    edge_1_right_vertex_position,
@@ -758,10 +827,10 @@ class SpatialGraph:
         node_1, node_2 = edge_1
         node_3, node_4 = edge_2
 
-        node_1_index = self.nodes.index(node_1)
-        node_2_index = self.nodes.index(node_2)
-        node_3_index = self.nodes.index(node_3)
-        node_4_index = self.nodes.index(node_4)
+        node_1_index = self.node_indices[node_1]
+        node_2_index = self.node_indices[node_2]
+        node_3_index = self.node_indices[node_3]
+        node_4_index = self.node_indices[node_4]
 
         node_1_position = self.node_positions_3d[node_1_index]
         node_2_position = self.node_positions_3d[node_2_index]
@@ -795,43 +864,117 @@ class SpatialGraph:
         return overlap_order
 
 
-    def get_crossings(self):
+    def _candidate_edge_pairs(self, tolerance=0.0001, edges=None):
+        """
+        Returns the index pairs (i, j), i < j, of the nonadjacent edges whose projections may be within the tolerance
+        of each other, in lexicographic order.
+
+        The projected bounding boxes of the edges (enlarged by the tolerance) are binned in a uniform grid whose cells
+        are about the size of an average box, so only edges that share a cell are paired. Pairs whose boxes do not
+        overlap, and pairs in which one segment lies on one side of the other's line by more than the tolerance, are
+        then rejected with vectorized tests. Neither test rejects a pair whose segments are within the tolerance.
+
+        If an array of edge indices is given, only the pairs that include one of those edges are returned, and their
+        boxes are compared with all the others directly instead.
+        """
+
+        if len(self.edges) < 2:
+            return []
 
-        crossing_num = 0
-        crossings    = []
-        crossing_edge_pairs = []
-        crossing_positions = []
+        ends = self.edge_ends
+        a, b = self.node_positions_2d[ends[:, 0]], self.node_positions_2d[ends[:, 1]]
 
+        lower = np.minimum(a, b) - tolerance
+        upper = np.maximum(a, b) + tolerance
 
+        if edges is not None:
+            k, l = np.nonzero(np.all((lower[edges, None] <= upper[None]) & (lower[None] <= upper[edges, None]), axis=2))
+            pairs = {(min(e, f), max(e, f)) for e, f in zip(np.asarray(edges)[k].tolist(), l.tolist()) if e != f}
+            return self._filter_candidate_edge_pairs(pairs, a, b, lower, upper, tolerance)
 
-        # TODO Modify nonadjacent edge pairs that are within some axis aligned bounding box
+        # Broad phase: bin the bounding boxes in a uniform grid
+        cell_size = max(float(np.mean(upper - lower)), tolerance)
+        first_cells = np.floor((lower - lower.min(axis=0)) / cell_size).astype(int)
+        last_cells = np.floor((upper - lower.min(axis=0)) / cell_size).astype(int)
 
-        for line_1, line_2 in self.nonadjacent_edge_pairs:
+        cells = collections.defaultdict(list)
+        for edge, ((x0, z0), (x1, z1)) in enumerate(zip(first_cells, last_cells)):
+            for x in range(x0, x1 + 1):
+                for z in range(z0, z1 + 1):
+                    cells[x, z].append(edge)
 
-            a = self.node_positions_dict_2d[line_1[0]]
-            b = self.node_positions_dict_2d[line_1[1]]
-            c = self.node_positions_dict_2d[line_2[0]]
-            d = self.node_positions_dict_2d[line_2[1]]
+        pairs = set()
+        for cell_edges in cells.values():
+            pairs.update(combinations(cell_edges, 2))
 
-            min_dist, crossing_position = get_line_segment_intersection(a, b, c, d)
+        return self._filter_candidate_edge_pairs(pairs, a, b, lower, upper, tolerance)
 
-            if min_dist > 0.0001:
-                crossing_position = None
+    def _filter_candidate_edge_pairs(self, pairs, a, b, lower, upper, tolerance):
+        """
+        Returns the pairs of the broad phase of _candidate_edge_pairs that pass its vectorized tests, in lexicographic
+        order.
+        """
+
+        if len(pairs) == 0:
+            return []
 
-            if crossing_position is np.inf:
-                raise ValueError('The edges are overlapping. This is not a valid spatial graph.')
+        ends = self.edge_ends
+        i, j = np.array(sorted(pairs)).T
 
-            elif crossing_position is None:
-                pass
+        # Nonadjacent edges with overlapping bounding boxes
+        keep = np.all((lower[i] <= upper[j]) & (lower[j] <= upper[i]), axis=1)
+        for k in range(2):
+            for l in range(2):
+                keep &= ends[i, k] != ends[j, l]
+        i, j = i[keep], j[keep]
 
-            elif type(crossing_position) is np.ndarray and min_dist < 0.0001:
-                crossings.append('crossing_' + str(crossing_num))
-                crossing_num += 1
-                crossing_positions.append(crossing_position)
-                crossing_edge_pair = self.get_crossing_edge_order(line_1, line_2, crossing_position)
-                crossing_edge_pairs.append(crossing_edge_pair)
+        # Reject pairs in which both ends of one segment are on the same side of the other's line
+        keep = np.ones(len(i), dtype=bool)
+        for p, q in [(i, j), (j, i)]:
+            direction = b[p] - a[p]
+            length = np.linalg.norm(direction, axis=1)
+            side_1 = (direction[:, 0] * (a[q] - a[p])[:, 1] - direction[:, 1] * (a[q] - a[p])[:, 0]) / length
+            side_2 = (direction[:, 0] * (b[q] - a[p])[:, 1] - direction[:, 1] * (b[q] - a[p])[:, 0]) / length
+            keep &= ~(((side_1 > tolerance) & (side_2 > tolerance)) | ((side_1 < -tolerance) & (side_2 < -tolerance)))
+        i, j = i[keep], j[keep]
 
-        return crossings, crossing_positions, crossing_edge_pairs
+        return list(zip(i.tolist(), j.tolist()))
+
+    def _find_crossings(self, pairs):
+        """
+        Returns a dictionary that maps the index pairs (i, j) of the edges whose projections cross to the position of
+        the crossing and the ordered edge pair that forms it. The pairs are tested all at once with
+        get_line_segment_intersections.
+        """
+
+        crossing_pairs = {}
+
+        if len(pairs) == 0:
+            return crossing_pairs
+
+        ends = self.edge_ends
+        i, j = np.array(pairs).T
+        positions = self.node_positions_2d
+        min_dists, min_dist_positions = get_line_segment_intersections(positions[ends[i, 0]], positions[ends[i, 1]],
+                                                                       positions[ends[j, 0]], positions[ends[j, 1]])
+
+        for (i, j), min_dist, crossing_position in zip(pairs, min_dists, min_dist_positions):
+            if min_dist < 0.0001:
+                crossing_edge_pair = self.get_crossing_edge_order(self.edges[i], self.edges[j], crossing_position)
+                crossing_pairs[i, j] = crossing_position, crossing_edge_pair
+
+        return crossing_pairs
+
+    def get_crossings(self):
+        """
+        Returns the crossings of the projected edges (named in the order of nonadjacent_edge_pairs), their positions,
+        and the ordered edge pairs that form them.
+
+        The crossings are those of self.crossing_pairs, which are found when the graph is created and kept up to date
+        by update_positions, so the edge pairs are not tested again.
+        """
+
+        return list(self.crossings), list(self.crossing_positions), list(self.crossing_edge_pairs)
 
     def get_crossings_3D(self):
         """
@@ -846,7 +989,7 @@ class SpatialGraph:
         crossing_positions_2D = np.hstack((xz_coords, y_coords))
         crossing_positions_2D = crossing_positions_2D[:, [0, 2, 1]]
 
-        nodes_dict = {node: self.node_positions_3d[self.nodes.index(node)] for node in self.nodes}
+        nodes_dict = {node: position for node, position in zip(self.nodes, self.node_positions_3d)}
 
         crossing_positions_3D = []
         for crossing, crossing_position_2D,crossing_edge_pair in zip(crossings, crossing_positions_2D, crossing_edge_pairs):
@@ -932,6 +1075,161 @@ class SpatialGraph:
 
         return position_c_02, position_c_13
 
+    def _set_projection(self, node_positions_3d):
+        """
+        Sets the rotated 3D positions of the nodes and their projections onto the xz-plane.
+        """
+
+        self.node_positions_3d = node_positions_3d
+        self.node_positions_2d = self.node_positions_3d[:, [0, 2]]
+        self.node_positions_dict_2d = {node: position for node, position in zip(self.nodes, self.node_positions_2d)}
+
+    def update_positions(self, changed_nodes, new_positions) -> bool:
+        """
+        Moves the given nodes, updates the projection and the crossings, and returns whether the diagram changed.
+
+        The moved nodes are projected with the rotation of the current projection, and only the edge pairs that include
+        an edge incident to a moved node are tested for crossings. If a moved edge is vertical or horizontal, or
+        overlaps an adjacent edge, in that projection, the whole graph is projected again (see project) and the diagram
+        is reported as changed.
+
+        Otherwise the diagram is unchanged if the moved edges cross the same edges as before, the edges around the
+        moved nodes and their neighbors are in the same cyclic order, and the crossings along the moved edges and the
+        edges they cross are in the same order, with the same edges over and the same orientations. In that case the
+        Yamada polynomial of the previous diagram still applies.
+
+        :param changed_nodes: The nodes to move.
+        :param new_positions: The new 3D positions of the nodes, in the order of changed_nodes.
+        :return: True if the diagram changed, False otherwise.
+        """
+
+        node_indices = np.array([self.node_indices[node] for node in changed_nodes], dtype=int)
+        new_positions = np.asarray(new_positions, dtype=float).reshape(-1, 3)
+
+        for node, position in zip(changed_nodes, new_positions):
+            self.node_positions_dict_3d[node] = position
+
+        # The edges incident to the moved nodes and the adjacent edge pairs that include one of them
+        moved = np.zeros(len(self.edges), dtype=bool)
+        for i in node_indices:
+            moved[self._incident_slice(i)[0]] = True
+        moved_edges = np.flatnonzero(moved)
+        adjacent_edge_indices = self.adjacent_edge_indices[np.any(moved[self.adjacent_edge_indices], axis=1)]
+
+        # The part of the diagram that may change: the moved nodes and their neighbors, the moved edges, and the edges
+        # they cross
+        nearby_nodes = sorted(set(node_indices.tolist()) |
+                              {k for i in node_indices for k in self._incident_slice(i)[1].tolist()})
+        moved_crossing_pairs = self._crossing_pairs_of_edges(moved_edges)
+        nearby_edges = sorted(set(moved_edges.tolist()) | {k for pair in moved_crossing_pairs for k in pair})
+        old_signature = self._diagram_signature(nearby_nodes, nearby_edges)
+
+        # Rotate the moved nodes about the same reference point as the others
+        node_positions_3d = self.node_positions_3d.copy()
+        node_positions_3d[node_indices] = rotate(np.vstack((self.projection_reference, new_positions)),
+                                                 self.projection_rotation)[1:]
+
+        try:
+            self._check_projection(node_positions_3d[:, [0, 2]], self.edge_ends[moved_edges], adjacent_edge_indices)
+
+        except ValueError:
+            node_positions = np.array([self.node_positions_dict_3d[node] for node in self.nodes])
+            self._set_projection(self.project(node_positions, initial_rotation=self.projection_rotation))
+            self.crossing_pairs = self._find_crossings(self._candidate_edge_pairs())
+            self._index_crossings()
+            return True
+
+        self._set_projection(node_positions_3d)
+        crossing_pairs = {(i, j): crossing for (i, j), crossing in self.crossing_pairs.items()
+                          if not moved[i] and not moved[j]}
+        crossing_pairs.update(self._find_crossings(self._candidate_edge_pairs(edges=moved_edges)))
+        self.crossing_pairs = crossing_pairs
+        self._index_crossings()
+
+        if self._crossing_pairs_of_edges(moved_edges) != moved_crossing_pairs:
+            return True
+
+        return self._diagram_signature(nearby_nodes, nearby_edges) != old_signature
+
+    def _crossing_pairs_of_edges(self, edge_indices):
+        """
+        Returns the set of the index pairs of the crossings along the given edges.
+        """
+
+        return {self.crossing_edge_indices[k] for edge in edge_indices
+                for k in self.edge_crossing_indices.get(self.edges[edge], [])}
+
+    def _diagram_signature(self, node_indices, edge_indices):
+        """
+        Describes the diagram at the given nodes and edges by node and edge indices: the cyclic order of the edges
+        around each node, the crossings along each edge, and the under edge and orientation of each of those crossings.
+        """
+
+        positions = self.node_positions_2d
+
+        # The edges around each node in anticlockwise order, starting from the one with the smallest index
+        node_orders = []
+        for i in node_indices:
+            incident_edges, incident_nodes = self._incident_slice(i)
+            vectors = positions[incident_nodes] - positions[i]
+            order = incident_edges[np.argsort(np.arctan2(vectors[:, 1], vectors[:, 0]), kind='stable')].tolist()
+            start = order.index(min(order)) if len(order) > 0 else 0
+            node_orders.append(tuple(order[start:] + order[:start]))
+
+        # The crossings along each edge from its first node to its second
+        edge_orders = []
+        crossings = {}
+        for edge in edge_indices:
+            start, stop = positions[self.edge_ends[edge]]
+            edge_crossings = []
+            for k in self.edge_crossing_indices.get(self.edges[edge], []):
+                i, j = self.crossing_edge_indices[k]
+                position, (under_edge, _) = self.crossing_pairs[i, j]
+                edge_crossings.append((np.dot(position - start, stop - start), (i, j)))
+
+                # The under edge, and whether the edges cross anticlockwise
+                (a, b), (c, d) = positions[self.edge_ends[i]], positions[self.edge_ends[j]]
+                orientation = (b - a)[0] * (d - c)[1] - (b - a)[1] * (d - c)[0] > 0
+                crossings[i, j] = i if self.edges[i] == under_edge else j, orientation
+
+            edge_orders.append(tuple(pair for _, pair in sorted(edge_crossings)))
+
+        return tuple(node_orders), tuple(edge_orders), tuple(sorted(crossings.items()))
+
+    def _check_projection(self, projected_node_positions, edge_ends, adjacent_edge_indices):
+        """
+        Raises a ValueError if one of the given edges is vertical or horizontal, or if one of the given pairs of
+        adjacent edges overlaps in the projection.
+
+        :param projected_node_positions: The projected positions of the nodes.
+        :param edge_ends: An array of the node indices of the endpoints of the edges to check.
+        :param adjacent_edge_indices: An array of the index pairs of the adjacent edges to check.
+        """
+
+        # First, check that no edges are perfectly vertical or perfectly horizontal.
+        # While neither of these cases technically incorrect, it's easier to implement looping through rotations
+        # rather than add edge cases for each 2D and 3D line equation.
+
+        edge_vectors = projected_node_positions[edge_ends[:, 1]] - projected_node_positions[edge_ends[:, 0]]
+        if np.any(edge_vectors == 0):
+            raise ValueError('An edge is vertical or horizontal. This is not a valid spatial graph.')
+
+        # Second, check adjacent edge pairs for validity.
+        # Since adjacent segments are straight lines, they should only intersect at a single endpoint.
+        # The only other possibility is for them to infinitely overlap, which is not a valid spatial graph.
+
+        if len(adjacent_edge_indices) > 0:
+            ends = self.edge_ends[adjacent_edge_indices].reshape(-1, 4)
+            a, b, c, d = (projected_node_positions[ends[:, k]] for k in range(4))
+            min_dists, crossing_positions = get_line_segment_intersections(a, b, c, d)
+
+            at_endpoint = np.zeros(len(ends), dtype=bool)
+            for endpoint in [a, b, c, d]:
+                at_endpoint |= np.all((crossing_positions - endpoint) < 0.0001, axis=1)
+
+            if np.any((min_dists <= 0.0001) & ~at_endpoint):
+                raise ValueError('Adjacent edges must intersect at the endpoints.')
+
     def project(self, node_positions, max_iter=2, initial_rotation=(0, 0, 0)):
         """
         Project the spatial graph onto a random 2D plane.
@@ -958,41 +1256,8 @@ class SpatialGraph:
                 rotated_node_positions = rotate(node_positions, rotation)
                 projected_node_positions = rotated_node_positions[:, [0, 2]]
 
-                # First, check that no edges are perfectly vertical or perfectly horizontal.
-                # While neither of these cases technically incorrect, it's easier to implement looping through rotations
-                # rather than add edge cases for each 2D and 3D line equation.
-
-                for edge in self.edges:
-                    x1, z1 = projected_node_positions[self.nodes.index(edge[0])]
-                    x2, z2 = projected_node_positions[self.nodes.index(edge[1])]
-
-                    if x1 == x2 or z1 == z2:
-                        raise ValueError('An edge is vertical or horizontal. This is not a valid spatial graph.')
-
-                # Second, check adjacent edge pairs for validity.
-                # Since adjacent segments are straight lines, they should only intersect at a single endpoint.
-                # The only other possibility is for them to infinitely overlap, which is not a valid spatial graph.
-
-                for line_1, line_2 in self.adjacent_edge_pairs:
-                    a = projected_node_positions[self.nodes.index(line_1[0])]
-                    b = projected_node_positions[self.nodes.index(line_1[1])]
-                    c = projected_node_positions[self.nodes.index(line_2[0])]
-                    d = projected_node_positions[self.nodes.index(line_2[1])]
-                    min_dist, crossing_position, = get_line_segment_intersection(a, b, c, d)
-
-                    if min_dist > 0.0001:
-                        crossing_position = None
-
-                    if crossing_position is not None and crossing_position is not np.inf:
-                        assertion_1 = all((crossing_position - a) < 0.0001)
-                        assertion_2 = all((crossing_position - b) < 0.0001)
-                        assertion_3 = all((crossing_position - c) < 0.0001)
-                        assertion_4 = all((crossing_position - d) < 0.0001)
-                        if not any([assertion_1, assertion_2, assertion_3, assertion_4]):
-                            raise ValueError('Adjacent edges must intersect at the endpoints.')
-
-                    elif crossing_position is np.inf:
-                        raise ValueError('The edges are overlapping. This is not a valid spatial graph.')
+                # First and second, check the edges and the adjacent edge pairs
+                self._check_projection(projected_node_positions, self.edge_ends, self.adjacent_edge_indices)
 
                 # Third, Check nonadjacent edge pairs for validity.
                 # Since nonadjacent segments are straight lines, they should only intersect at zero or one points.
@@ -1009,6 +1274,10 @@ class SpatialGraph:
 
         # raise Exception('Could not find a valid rotation after {} iterations'.format(max_iter))
 
+        # Record the rotation (about the first node) so that moved nodes can be projected consistently
+        self.projection_rotation = rotation
+        self.projection_reference = node_positions[0]
+
         rotated_node_positions = rotate(node_positions, rotation)
         return rotated_node_positions
 
@@ -1018,6 +1287,7 @@ class SpatialGraph:
         """
 
         nodes_and_crossings = self.nodes + self.crossings
+        nodes_and_crossings_indices = {node: i for i, node in enumerate(nodes_and_crossings)}
 
         # Create the vertex and crossing objects
         vertices = [Vertex(self.node_degree(node), 'node_' + node) for node in self.nodes]
@@ -1036,8 +1306,8 @@ class SpatialGraph:
         for sub_edge in self.get_sub_edges():
             node_a, node_b = sub_edge
 
-            node_a_index = nodes_and_crossings.index(node_a)
-            node_b_index = nodes_and_crossings.index(node_b)
+            node_a_index = nodes_and_crossings_indices[node_a]
+            node_b_index = nodes_and_crossings_indices[node_b]
 
             vertex_a = vertices_and_crossings[node_a_index]
             vertex_b = vertices_and_crossings[node_b_index]
@@ -0,0 +1,142 @@
+"""State sums
+
+A non-recursive evaluation of the Yamada polynomial.
+
+Expanding the skein relation Y(D) = A Y(S_plus) + A^(-1) Y(S_minus) + Y(S_0) at every crossing gives the state sum
+
+    Y(D) = sum over states s of A^(#plus(s) - #minus(s)) H(G_s)
+
+where a state resolves each of the n crossings of D as plus, minus, or zero and G_s is the projection graph of the
+resulting crossingless diagram. The 3^n states are visited in reflected ternary Gray code order, so consecutive states
+differ in the resolution of a single crossing and the projection graph is updated locally rather than rebuilt.
+"""
+
+import time
+import networkx as nx
+from yamada.H_polynomial import h_poly, H_poly_cache
+from yamada.laurent_polynomials import LaurentPolynomial
+
+
+RESOLUTIONS = ('plus', 'minus', 'zero')
+
+# The inputs of a crossing joined by each resolution. 'plus' short-cuts inputs 0-1 and 2-3 and 'minus' short-cuts
+# inputs 1-2 and 3-0, whereas 'zero' smushes all four inputs into one vertex.
+_RESOLUTION_NODES = {'plus':  (0, 0, 2, 2),
+                     'minus': (3, 1, 1, 3),
+                     'zero':  (4, 4, 4, 4)}
+
+_EXPONENTS = {'plus': 1, 'minus': -1, 'zero': 0}
+
+
+def gray_code(radices):
+    """
+    Generates the changes of a reflected mixed-radix Gray code (Knuth, TAOCP 7.2.1.1, Algorithm M).
+
+    Starting from all digits zero, yields (position, digit) each time the digit at position changes to a new value.
+    Every one of the prod(radices) digit sequences is visited exactly once and consecutive sequences differ in a
+    single digit.
+    """
+
+    n = len(radices)
+    digits = [0] * n
+    directions = [1] * n
+    focus = list(range(n + 1))
+
+    while True:
+        j = focus[0]
+        focus[0] = 0
+        if j == n:
+            return
+
+        digits[j] += directions[j]
+        yield j, digits[j]
+
+        if digits[j] == 0 or digits[j] == radices[j] - 1:
+            directions[j] = -directions[j]
+            focus[j] = focus[j + 1]
+            focus[j + 1] = j + 1
+
+
+def _node(part, index, resolutions):
+    """
+    Returns the projection graph node at input index of a vertex or resolved crossing.
+    """
+
+    resolution = resolutions.get(part.label)
+    if resolution is None:
+        return part.label
+    return part.label, _RESOLUTION_NODES[resolution][index]
+
+
+def _add_edge(graph, edge, resolutions):
+    (A, i), (B, j) = edge.adjacent
+    graph.add_edge(_node(A, i, resolutions), _node(B, j, resolutions), key=edge.label)
+
+
+def iter_resolution_states(sgd):
+    """
+    Generates the resolution states of the crossings of a spatial graph diagram in Gray code order.
+
+    Yields (exponent, projection_graph) where exponent is #plus - #minus. The projection graph is updated in place
+    between states, so it must not be modified (or kept) by the caller.
+    """
+
+    crossings = list(sgd.crossings)
+    resolutions = {C.label: RESOLUTIONS[0] for C in crossings}
+
+    graph = nx.MultiGraph()
+    graph.add_nodes_from(V.label for V in sgd.vertices)
+    for E in sgd.edges:
+        _add_edge(graph, E, resolutions)
+
+    exponent = _EXPONENTS[RESOLUTIONS[0]] * len(crossings)
+    yield exponent, graph
+
+    for position, digit in gray_code(len(crossings) * [len(RESOLUTIONS)]):
+        C = crossings[position]
+        old, new = resolutions[C.label], RESOLUTIONS[digit]
+        exponent += _EXPONENTS[new] - _EXPONENTS[old]
+
+        # Replace the node(s) of the crossing and reattach its edges
+        graph.remove_nodes_from({_node(C, i, resolutions) for i in range(4)})
+        resolutions[C.label] = new
+        for E in {E for E, _ in C.adjacent}:
+            _add_edge(graph, E, resolutions)
+
+        yield exponent, graph
+
+
+def yamada_state_sum(sgd, timings=None, h_poly_cache=H_poly_cache):
+    """
+    Returns the non-normalized Yamada polynomial of a spatial graph diagram by summing over its resolution states.
+
+    :param sgd: The spatial graph diagram.
+    :param timings: An optional dictionary in which the number of states and the time spent updating projection
+        graphs and computing their H polynomials are accumulated under 'states', 'update', and 'h_poly'.
+    :param h_poly_cache: The HPolyCache used for the H polynomials of the projection graphs, or None.
+    """
+
+    ans = LaurentPolynomial([])
+
+    if timings is not None:
+        for key in ['states', 'update', 'h_poly']:
+            timings.setdefault(key, 0)
+
+    states = iter_resolution_states(sgd)
+
+    while True:
+        start = time.perf_counter()
+        try:
+            exponent, graph = next(states)
+        except StopIteration:
+            break
+        middle = time.perf_counter()
+
+        ans += h_poly(graph, h_poly_cache).shift(exponent)
+
+        if timings is not None:
+            timings['states'] += 1
+            timings['update'] += middle - start
+            timings['h_poly'] += time.perf_counter() - middle
+
+    return ans
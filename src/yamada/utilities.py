@@ -1,6 +1,7 @@
 import glob
 import json
 import pickle
+from yamada.laurent_polynomials import LaurentPolynomial
 
 
 def get_coefficients_and_exponents(poly):
@@ -12,8 +13,14 @@ def get_coefficients_and_exponents(poly):
     had explicit attributes for coefficients and exponents that you could directly query. However, switching
     to the cypari library to improve OS compatibility added a few complications, including that there is no native
     method to access the coefficients and exponents of Yamada polynomials. This function obtains them.
+
+    Polynomials are now computed as LaurentPolynomials, whose coefficients are read directly. Both types return the
+    coefficients and exponents from the highest degree downwards.
     """
 
+    if isinstance(poly, LaurentPolynomial):
+        return list(poly)[::-1], list(poly.exponents)[::-1]
+
     # Assumes all denominators are only A**n with no coefficient
     coefficients = poly.numerator().Vec()
     coeff_len = len(coefficients)
@@ -0,0 +1,34 @@
+"""Spatial graph diagrams shared by the Yamada polynomial tests.
+
+
+"""
+
+from yamada import SpatialGraphDiagram, Vertex, Crossing
+
+
+def theta_2_graph(labels='abXYZ'):
+    """
+    The Theta_2 graph from Drobrynin and Vesnin
+    """
+    va, vb = Vertex(3, labels[0]), Vertex(3, labels[1])
+    x, y, z = [Crossing(L) for L in labels[2:]]
+    va[0], va[1], va[2] = x[0], vb[2], y[1]
+    vb[0], vb[1] = x[3], z[0]
+    x[1], x[2] = y[0], z[1]
+    y[2], y[3] = z[3], z[2]
+    return SpatialGraphDiagram([va, vb, x, y, z])
+
+
+def omega_2_graph():
+    """
+    The Omega_2 graph from Drobrynin and Vesnin
+    """
+    va, vb, vc, vd = [Vertex(3, L) for L in 'abcd']
+    x, y, z = [Crossing(L) for L in 'XYZ']
+    va[0], va[1], va[2] = vd[0], vb[2], x[2]
+    vb[0], vb[1] = vc[0], x[3]
+    vc[1], vc[2] = vd[2], z[0]
+    vd[1] = z[1]
+    x[0], x[1] = y[3], y[2]
+    y[0], y[1] = z[3], z[2]
+    return SpatialGraphDiagram([va, vb, vc, vd, x, y, z])
@@ -0,0 +1,99 @@
+"""Test the parsing and filtering of plantri shadows.
+
+
+"""
+
+import io
+import itertools
+import pytest
+import networkx as nx
+from yamada.enumeration import parse_edge_codes, read_edge_code, plantri_command, graph_invariants, TargetGraph, Shadow
+from yamada.enumeration import EnumerationCheckpoint, iter_shadows_via_plantri, enumerate_yamada_classes
+from yamada.Reidemeister import has_r2
+
+
+def test_parse_edge_codes():
+    codes = [[[0, 1, 2], [0, 2, 1]], [[0, 1, 2, 3], [4, 0, 5, 6], [7, 4, 8]]]
+    data = b''
+    for code in codes:
+        body = b'\xff'.join(bytes(edges) for edges in code)
+        data += bytes([len(body)]) + body
+
+    assert parse_edge_codes(data) == (codes, len(data))
+    assert parse_edge_codes(data[:-1]) == (codes[:1], 8)
+
+    stream = io.BytesIO(data[1:])
+    assert read_edge_code(stream, data[0]) == codes[0]
+
+
+def test_plantri_command_shards():
+    assert plantri_command('./', 2, 3)[-1] == '6'
+    assert plantri_command('./', 2, 3, res=1, mod=4)[-2:] == ['6', '1/4']
+
+
+
+def test_missing_plantri(tmp_path, monkeypatch):
+    # A missing plantri is an error, not an empty enumeration
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(RuntimeError, match='plantri'):
+        list(iter_shadows_via_plantri('./', 2, 3))
+    with pytest.raises(RuntimeError, match='plantri'):
+        enumerate_yamada_classes(nx.MultiGraph([(0, 1), (0, 1), (0, 1)]), 2)
+
+def test_target_graph():
+    K4 = nx.MultiGraph([(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)])
+    target = TargetGraph(K4)
+    assert target.is_isomorphic(nx.relabel_nodes(K4, {0: 'V2', 1: 'V0', 2: 'V3', 3: 'V1'}))
+    assert not target.is_isomorphic(nx.MultiGraph([(0, 1), (0, 1), (2, 3), (2, 3), (0, 2), (1, 3)]))
+    assert not target.is_isomorphic(None)
+
+    # Same invariants and Weisfeiler-Lehman hash, told apart by the canonical form
+    prism = nx.MultiGraph(nx.circular_ladder_graph(3))
+    K33 = nx.MultiGraph(nx.complete_bipartite_graph(3, 3))
+    assert graph_invariants(prism) == graph_invariants(K33)
+    assert TargetGraph(prism).is_isomorphic(prism) and not TargetGraph(prism).is_isomorphic(K33)
+
+
+def test_sign_vectors():
+    # A theta curve shadow whose two crossings are joined by a bigon, and an asymmetric one with three crossings
+    symmetric = Shadow([[0, 1, 2, 3], [1, 0, 4, 5], [6, 5, 4], [2, 6, 3]])
+    asymmetric = Shadow([[0, 1, 2, 3], [4, 0, 5, 6], [1, 4, 7], [8, 6, 5], [7, 8, 3, 2]])
+    assert len(symmetric.map_automorphisms()) == 4 and len(asymmetric.map_automorphisms()) == 1
+
+    for shadow in [symmetric, asymmetric]:
+        constraints = shadow.r2_constraints()
+        polys = set()
+        for signs in itertools.product((0, 1), repeat=len(shadow.crossings)):
+            D = shadow.spatial_graph_diagram(signs=signs, check=False)
+            assert has_r2(D)[0] == any(signs[c1] ^ signs[c2] == parity for c1, c2, parity in constraints)
+            if not has_r2(D)[0]:
+                polys.add(D.normalized_yamada_polynomial())
+
+        # One sign vector per class, and every class is represented
+        representatives = [shadow.spatial_graph_diagram(signs=signs, check=False).normalized_yamada_polynomial()
+                           for signs in shadow.sign_vectors()]
+        assert set(representatives) == polys
+
+    assert list(symmetric.sign_vectors()) == [(0, 0)]
+    assert list(asymmetric.sign_vectors()) == [(0, 0, 0), (0, 1, 0)]
+
+
+def test_enumeration_checkpoint(tmp_path):
+    path = str(tmp_path / 'checkpoint.pickle')
+    theta = nx.MultiGraph(3 * [(0, 1)])
+    shadow = Shadow([[0, 1, 2, 3], [1, 0, 4, 5], [6, 5, 4], [2, 6, 3]])
+    D = shadow.spatial_graph_diagram(check=False)
+
+    checkpoint = EnumerationCheckpoint.start(theta, path, resume=True)
+    checkpoint.add(0, 1, D)
+    checkpoint.complete(0, 0.5)
+    checkpoint.add(1, D.normalized_yamada_polynomial(), D)
+    checkpoint.save()
+
+    resumed = EnumerationCheckpoint.start(nx.MultiGraph([(1, 0), (0, 1), (1, 0)]), path, resume=True)
+    assert resumed.completed == {0} and resumed.offsets[1] == 1 and resumed.examined == 2
+    assert set(resumed.polys) == {1, D.normalized_yamada_polynomial()}
+    assert EnumerationCheckpoint.start(theta, path).examined == 0
+
+    with pytest.raises(ValueError):
+        EnumerationCheckpoint.start(nx.MultiGraph(nx.complete_graph(4)), path, resume=True)
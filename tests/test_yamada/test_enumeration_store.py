@@ -0,0 +1,44 @@
+"""Test the persistent enumeration store.
+
+
+"""
+
+import pytest
+import networkx as nx
+from yamada.enumeration import Shadow, EnumerationCheckpoint
+from yamada.enumeration_store import EnumerationStore
+from yamada.H_polynomial import canonical_form
+
+
+def test_store_round_trip(tmp_path):
+    path = str(tmp_path / 'enumerations.sqlite')
+    theta = nx.MultiGraph(3 * [(0, 1)])
+    key = canonical_form(theta)
+
+    shadows = [Shadow([[0, 1, 2], [0, 2, 1]]), Shadow([[0, 1, 2, 3], [1, 0, 4, 5], [6, 5, 4], [2, 6, 3]])]
+    diagrams = [shadow.spatial_graph_diagram(check=False) for shadow in shadows]
+    polys = {D.normalized_yamada_polynomial(): D for D in diagrams}
+
+    with EnumerationStore(path) as store:
+        assert store.get_level(key, 2) is None
+        store.put_level(key, 2, polys, 5)
+        store.put_level(key, 0, polys, 1)
+        assert store.levels(key) == [0, 2] and store.levels(canonical_form(nx.complete_graph(4))) == []
+
+    with EnumerationStore(path, readonly=True) as store:
+        stored, examined = store.get_level(key, 2)
+        assert list(stored) == list(polys) and examined == 5
+        assert [D.normalized_yamada_polynomial() for D in stored.values()] == list(polys)
+        with pytest.raises(ValueError):
+            store.put_level(key, 3, polys, 1)
+
+        # Stored crossing numbers are merged rather than recomputed
+        state = EnumerationCheckpoint(theta)
+        assert state.load_level(2, store) and not state.load_level(1, store)
+        assert state.completed == {2} and state.examined == 5 and list(state.polys) == list(polys)
+
+    # Levels without any diagrams are not stored
+    state = EnumerationCheckpoint(theta)
+    with EnumerationStore(path) as store:
+        state.complete(1, 0.0, store)
+        assert state.completed == {1} and store.levels(key) == [0, 2]
@@ -0,0 +1,83 @@
+"""Test the closed-form reductions of the H polynomial against its subgraph expansion.
+
+
+"""
+
+import itertools
+import random
+import networkx as nx
+from yamada import h_poly, LaurentPolynomial
+from yamada.caches import HPolyCache
+from yamada.H_polynomial import CYCLE_FACTOR, EDGE_SELECTION_STRATEGIES
+from yamada.state_sums import iter_resolution_states
+from test_yamada.example_diagrams import theta_2_graph, omega_2_graph
+
+
+def subgraph_expansion(g):
+    """
+    H(G) = sum over edge subsets F of (-1)^k(F) b^mu(F).
+    """
+
+    edges = list(g.edges())
+    ans = LaurentPolynomial([])
+    for r in range(len(edges) + 1):
+        for F in itertools.combinations(edges, r):
+            S = nx.MultiGraph()
+            S.add_nodes_from(g.nodes())
+            S.add_edges_from(F)
+            k = nx.number_connected_components(S)
+            mu = len(F) - len(S) + k
+            ans = ans + (-1) ** k * CYCLE_FACTOR ** mu
+    return ans
+
+
+def test_reductions_match_subgraph_expansion():
+    rng = random.Random(0)
+    for _ in range(60):
+        n = rng.randint(1, 5)
+        g = nx.MultiGraph()
+        g.add_nodes_from(range(n))
+        g.add_edges_from((rng.randrange(n), rng.randrange(n)) for _ in range(rng.randint(0, 8)))
+        assert h_poly(g, None) == subgraph_expansion(g)
+
+
+def test_irreducible_cores():
+    for g in [nx.complete_graph(4), nx.complete_bipartite_graph(3, 3), nx.petersen_graph()]:
+        g = nx.MultiGraph(g)
+        if g.number_of_edges() <= 10:
+            assert h_poly(g, None) == subgraph_expansion(g)
+
+    # Two copies of K4 glued at a vertex, by P3
+    K4 = nx.MultiGraph(nx.complete_graph(4))
+    glued = nx.compose(K4, nx.relabel_nodes(K4, {1: 4, 2: 5, 3: 6}))
+    assert h_poly(glued, None) == -h_poly(K4, None) ** 2
+
+
+def test_edge_selection_strategies():
+    g = nx.MultiGraph(nx.random_regular_graph(3, 10, seed=1))
+    expected = h_poly(g, None, 'first')
+    for name in EDGE_SELECTION_STRATEGIES:
+        stats = {}
+        assert h_poly(g, HPolyCache(), name, stats) == expected
+        assert stats['deletion_contractions'] > 0
+    assert h_poly(g, None, lambda G: max(G.edges)) == expected
+
+
+def test_path_decomposition_engine():
+    rng = random.Random(1)
+    for _ in range(60):
+        n = rng.randint(1, 7)
+        g = nx.MultiGraph()
+        g.add_nodes_from(range(n))
+        g.add_edges_from((rng.randrange(n), rng.randrange(n)) for _ in range(rng.randint(0, 12)))
+        assert h_poly(g, None, engine='path_decomposition') == h_poly(g, None)
+
+    for sgd in [theta_2_graph(), omega_2_graph()]:
+        for _, g in iter_resolution_states(sgd):
+            assert h_poly(g, None, engine='path_decomposition') == h_poly(g, None)
+
+    # A grid is 2-connected with many edges but a narrow path decomposition
+    stats = {}
+    grid = nx.MultiGraph(nx.grid_2d_graph(4, 4))
+    assert h_poly(grid, None, engine='path_decomposition', stats=stats) == h_poly(grid, None)
+    assert stats['path_decompositions'] == 1 and stats['deletion_contractions'] == 0
@@ -0,0 +1,38 @@
+"""Test the persistent H polynomial store.
+
+
+"""
+
+import pytest
+import networkx as nx
+from yamada import h_poly
+from yamada.caches import HPolyCache
+from yamada.H_polynomial import canonical_form
+from yamada.h_poly_store import HPolyStore, connected_multigraphs, precompute, preload_h_poly_cache
+
+
+def test_connected_multigraphs():
+    # The number of connected multigraphs with loops and n edges (OEIS A050535)
+    counts = [0] * 6
+    for num_vertices, edges in connected_multigraphs(5):
+        assert nx.is_connected(nx.MultiGraph(edges))
+        counts[len(edges)] += 1
+    assert counts == [0, 2, 4, 11, 30, 95]
+
+
+def test_store_round_trip(tmp_path):
+    path = str(tmp_path / 'h_poly.sqlite')
+
+    with HPolyStore(path) as store:
+        assert precompute(store, 4) == len(store) > 0
+        assert precompute(store, 4) == 0
+
+    g = nx.MultiGraph([(0, 1), (1, 2), (2, 0), (0, 1)])
+    with HPolyStore(path, readonly=True) as store:
+        assert store.get(canonical_form(g)) == h_poly(g, None)
+        with pytest.raises(ValueError):
+            store.put(canonical_form(g), h_poly(g, None))
+
+    cache = HPolyCache()
+    assert preload_h_poly_cache(path, cache) == len(cache)
+    assert cache.get(canonical_form(g)) == h_poly(g, None)
@@ -0,0 +1,145 @@
+"""Test the canonical diagram codes and the memoization of Yamada polynomials.
+
+
+"""
+
+import networkx as nx
+from yamada import SpatialGraphDiagram, Crossing, h_poly
+from yamada.caches import BoundedCache, HPolyCache
+from yamada.H_polynomial import canonical_form
+from test_yamada.example_diagrams import theta_2_graph, omega_2_graph
+
+
+def test_canonical_code_ignores_labels():
+    assert theta_2_graph('abXYZ').canonical_code() == theta_2_graph('pqRST').canonical_code()
+
+
+def test_canonical_code_ignores_crossing_rotation():
+    x1 = Crossing('X')
+    x1[0], x1[2] = x1[1], x1[3]
+    x2 = Crossing('X')
+    x2[2], x2[0] = x2[3], x2[1]
+    assert SpatialGraphDiagram([x1]).canonical_code() == SpatialGraphDiagram([x2]).canonical_code()
+
+
+def test_canonical_code_distinguishes_mirror_images():
+    x1 = Crossing('X')
+    x1[0], x1[2] = x1[1], x1[3]
+    x2 = Crossing('X')
+    x2[1], x2[3] = x2[2], x2[0]
+    assert SpatialGraphDiagram([x1]).canonical_code() != SpatialGraphDiagram([x2]).canonical_code()
+
+
+def test_canonical_code_distinguishes_diagrams():
+    assert theta_2_graph().canonical_code() != omega_2_graph().canonical_code()
+
+
+def test_memoized_yamada_polynomial():
+    cache = BoundedCache(max_entries=1000)
+    for sgd in [theta_2_graph(), omega_2_graph()]:
+        assert sgd.yamada_polynomial(cache=cache) == sgd.yamada_polynomial(cache=None)
+    assert 0 < len(cache) <= 1000
+
+    sgd = theta_2_graph('pqRST')
+    hits = cache.hits
+    assert sgd.normalized_yamada_polynomial() == theta_2_graph().normalized_yamada_polynomial()
+    assert sgd.yamada_polynomial(cache=cache) == theta_2_graph().yamada_polynomial(cache=None)
+    assert cache.hits == hits + 1
+
+
+def test_bounded_cache_eviction():
+    cache = BoundedCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert 'b' not in cache
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.get('b') is None
+    assert (cache.hits, cache.misses) == (3, 1)
+    cache.clear()
+    assert len(cache) == 0 and cache.hits == 0
+
+
+def test_canonical_form_of_multigraphs():
+    g = nx.MultiGraph([(0, 1), (0, 1), (1, 2), (2, 0), (2, 2)])
+    h = nx.MultiGraph([('c', 'b'), ('b', 'a'), ('a', 'a'), ('c', 'a'), ('b', 'c')])
+    assert canonical_form(g) == canonical_form(h)
+
+    # The same numbers of vertices, edges, and loops
+    k = nx.MultiGraph([(0, 1), (0, 1), (1, 2), (2, 0), (0, 0)])
+    assert canonical_form(g) != canonical_form(k)
+
+    # Two triangles versus a hexagon
+    two_triangles = nx.MultiGraph([(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3)])
+    assert canonical_form(two_triangles) != canonical_form(nx.MultiGraph(nx.cycle_graph(6)))
+
+
+def test_h_poly_cache_counters():
+    cache = HPolyCache()
+    g = nx.MultiGraph([(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3)])
+    hexagon = nx.MultiGraph(nx.cycle_graph(6))
+
+    cache.set(canonical_form(g), h_poly(g))
+    assert cache.get(canonical_form(nx.relabel_nodes(g, {0: 'x', 4: 'y'}))) == h_poly(g)
+    assert cache.get(canonical_form(hexagon)) is None
+    assert cache.get(canonical_form(nx.MultiGraph([(0, 0)]))) is None
+    assert (cache.hits, cache.misses, cache.collisions) == (1, 2, 1)
+
+
+def test_bounded_cache_lfu_eviction():
+    cache = BoundedCache(max_entries=2, policy='lfu')
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1 and cache.get('a') == 1
+    cache.set('c', 3)
+    assert 'b' not in cache and 'a' in cache
+    cache.set('d', 4)
+    assert 'c' not in cache and 'a' in cache
+    assert cache.evictions == 2
+
+
+def test_bounded_cache_lfu_single_entry():
+    cache = BoundedCache(max_entries=1, policy='lfu')
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    cache.set('b', 2)
+    assert 'a' not in cache and cache.get('b') == 2
+
+
+def test_bounded_cache_lfu_evicts_least_used():
+    cache = BoundedCache(max_entries=2, policy='lfu')
+    cache.set('a', 1)
+    cache.set('b', 2)
+    for _ in range(2):
+        cache.get('b')
+    cache.get('a')
+
+    # 'b' has been used three times and 'a' twice
+    cache.set('c', 3)
+    assert 'a' not in cache and 'b' in cache and 'c' in cache
+
+
+def test_bounded_cache_byte_budget():
+    cache = BoundedCache(max_bytes=1000)
+    for i in range(100):
+        cache.set(i, (i, i + 1))
+        assert cache.nbytes <= 1000
+    assert 0 < len(cache) < 100 and cache.evictions == 100 - len(cache)
+    cache.set('big', tuple(range(1000)))
+    assert 'big' not in cache
+    cache.clear()
+    assert cache.nbytes == 0
+
+
+def test_h_poly_with_own_cache():
+    # A loop, a theta graph, K4, and K4 plus an edge
+    g = nx.MultiGraph([(0, 0), (1, 2), (1, 2), (1, 2)])
+    g.add_edges_from(nx.complete_graph([3, 4, 5, 6]).edges())
+    g.add_edges_from(nx.complete_graph([7, 8, 9, 10]).edges())
+    g.add_edge(7, 8)
+    cache = HPolyCache(max_entries=3, policy='lfu')
+    assert h_poly(g, cache) == h_poly(g, None)
+    assert len(cache) == 3 and cache.evictions > 0
+    assert theta_2_graph().yamada_polynomial(cache=None, h_poly_cache=cache) == \
+        theta_2_graph().yamada_polynomial(cache=None, h_poly_cache=None)
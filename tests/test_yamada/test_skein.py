@@ -0,0 +1,185 @@
+"""Test the evaluation strategies of the Yamada skein relation.
+
+
+"""
+
+import types
+import concurrent.futures
+from yamada import SpatialGraphDiagram, Crossing, yamada_polynomials
+from yamada.H_polynomial import H_poly_cache
+from yamada.spatial_graph_diagrams import yamada_polynomial_cache, _worker_caches
+from yamada.enumeration import Shadow
+from yamada.Reidemeister import has_r1, apply_r1, has_r2, apply_r2, r1_and_r2_simplify
+from yamada.state_sums import yamada_state_sum, gray_code
+from test_yamada.example_diagrams import theta_2_graph, omega_2_graph
+
+
+def test_in_place_yamada_polynomial():
+    for sgd in [theta_2_graph(), omega_2_graph()]:
+        code = sgd.canonical_code()
+        labels = set(sgd.data)
+        y_copy = sgd.yamada_polynomial(cache=None, in_place=False)
+        y_in_place = sgd.yamada_polynomial(cache=None, in_place=True)
+        assert y_copy == y_in_place
+        assert sgd.canonical_code() == code
+        assert set(sgd.data) == labels
+
+
+def test_undo_resolve_crossing():
+    x1 = Crossing('X')
+    x1[0], x1[2] = x1[1], x1[3]
+    sgd = SpatialGraphDiagram([x1])
+    code = sgd.canonical_code()
+    for resolution in ['plus', 'minus', 'zero']:
+        log = []
+        sgd.resolve_crossing(sgd.crossings[0], resolution, log)
+        assert len(sgd.crossings) == 0
+        sgd.undo(log)
+        assert len(log) == 0
+        assert sgd.canonical_code() == code
+
+
+def test_reidemeister_reduce():
+    # Kinks at inputs 0-1 and 1-2 contribute A^2 and A^(-2)
+    for i, exponent in [(0, 2), (1, -2)]:
+        x = Crossing('X')
+        x[i], x[i + 2] = x[i + 1], x[i + 3]
+        sgd = SpatialGraphDiagram([x])
+        assert sgd.find_r1(sgd.crossings[0]) is not None
+        Y = sgd.yamada_polynomial(cache=None)
+        log = []
+        assert sgd.reidemeister_reduce(log) == exponent and len(sgd.crossings) == 0
+        assert Y == sgd.yamada_polynomial(cache=None).shift(exponent)
+        sgd.undo(log)
+        assert len(sgd.crossings) == 1
+
+    # A theta curve whose two crossings cancel by a Reidemeister 2 move
+    sgd = Shadow([[0, 1, 2, 3], [1, 0, 4, 5], [6, 5, 4], [2, 6, 3]]).spatial_graph_diagram(signs=(0, 1))
+    code = sgd.canonical_code()
+    log = []
+    assert sgd.reidemeister_reduce(log) == 0 and len(sgd.crossings) == 0
+    sgd._check()
+    sgd.undo(log)
+    assert sgd.canonical_code() == code
+
+    for sgd in [sgd, theta_2_graph(), omega_2_graph()]:
+        assert sgd.yamada_polynomial(cache=None, simplify=True) == sgd.yamada_polynomial(cache=None)
+
+
+def test_r1_and_r2_simplify():
+    # An unknot with two kinks and no R2 move; both kinks are removed
+    x, y = Crossing('X'), Crossing('Y')
+    x[0], y[0], x[2], x[3] = x[1], y[1], y[3], y[2]
+    sgd = SpatialGraphDiagram([x, y])
+    simplified, r1_count, r2_count = r1_and_r2_simplify(sgd, 0, 0)
+    assert len(simplified.crossings) == 0 and (r1_count, r2_count) == (2, 0)
+    assert len(sgd.crossings) == 2
+
+    sgd = Shadow([[0, 1, 2, 3], [1, 0, 4, 5], [6, 5, 4], [2, 6, 3]]).spatial_graph_diagram(signs=(0, 1))
+    simplified, r1_count, r2_count = r1_and_r2_simplify(sgd, 1, 1)
+    assert len(simplified.crossings) == 0 and (r1_count, r2_count) == (1, 2)
+    assert simplified.normalized_yamada_polynomial() == sgd.normalized_yamada_polynomial()
+
+    # Diagrams in which has_r2 finds R2 moves are simplified as far as with has_r1/has_r2 and apply_r1/apply_r2
+    examples = [
+        ([[0, 1, 2, 3], [4, 0, 3, 5], [6, 4, 5, 7], [1, 6, 7, 2]], (0, 1, 1, 0)),
+        ([[0, 1, 2], [3, 0, 4, 5], [6, 3, 7, 8], [1, 6, 8, 9], [2, 9, 10], [10, 7, 5, 4]], (1, 1, 1, 0)),
+        ([[0, 1, 2, 3], [4, 0, 5, 6], [7, 4, 6, 8], [1, 7, 9, 2], [9, 8, 10], [10, 5, 3]], (0, 1, 1, 1)),
+        ([[0, 1, 2, 3], [4, 0, 3, 5], [6, 4, 7], [8, 6, 7, 9], [10, 8, 11], [1, 10, 2], [5, 11, 9]], (1, 0, 1)),
+    ]
+    for code, signs in examples:
+        sgd = Shadow(code).spatial_graph_diagram(signs=signs)
+        assert has_r2(sgd)[0]
+
+        expected = sgd
+        while True:
+            if has_r1(expected)[0]:
+                expected = apply_r1(expected, has_r1(expected)[1])
+            elif has_r2(expected)[0]:
+                expected = apply_r2(expected, has_r2(expected)[1])
+            else:
+                break
+
+        simplified, _, r2_count = r1_and_r2_simplify(sgd, 0, 0)
+        assert r2_count > 0 and len(simplified.crossings) == len(expected.crossings)
+        assert simplified.normalized_yamada_polynomial() == sgd.normalized_yamada_polynomial()
+
+
+def test_skein_subproblems():
+    # Any object with a map method may evaluate the subproblems
+    pool = types.SimpleNamespace(map=lambda f, diagrams: [f(D) for D in diagrams])
+    for sgd in [theta_2_graph(), omega_2_graph()]:
+        code = sgd.canonical_code()
+        subproblems = sgd.skein_subproblems(2)
+        assert len(subproblems) <= 9 and sum(sum(weight) for weight, _ in subproblems) == 9
+        assert all(len(S.crossings) == len(sgd.crossings) - 2 for _, S in subproblems)
+        assert sgd.canonical_code() == code
+
+        Y = sgd.yamada_polynomial(cache=None)
+        assert sgd.yamada_polynomial(cache=None, pool=pool) == Y
+        assert sgd.yamada_polynomial(cache=None, pool=pool, split_levels=5) == Y
+        assert sgd.yamada_polynomial(cache=None, pool=pool, check_pieces=True, in_place=False) == Y
+
+
+def test_pool_with_simplify():
+    workers = []
+
+    def pool_map(f, diagrams):
+        workers.append(f)
+        return [f(D) for D in diagrams]
+
+    pool = types.SimpleNamespace(map=pool_map)
+    for sgd in [theta_2_graph(), omega_2_graph()]:
+        Y = sgd.yamada_polynomial(cache=None)
+        assert sgd.yamada_polynomial(cache=None, pool=pool, split_levels=1, simplify=True) == Y
+        assert workers[-1].keywords['simplify']
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+        sgd = omega_2_graph()
+        assert sgd.yamada_polynomial(pool=executor, simplify=True) == sgd.yamada_polynomial(cache=None)
+
+
+def test_batch_yamada_polynomials():
+    diagrams = [theta_2_graph(), omega_2_graph(), theta_2_graph(), omega_2_graph().copy()]
+    expected = [D.normalized_yamada_polynomial() for D in diagrams]
+
+    # Identical diagrams are only evaluated once
+    evaluated = []
+    for D in diagrams:
+        def yamada_polynomial(D=D, **kwargs):
+            evaluated.append(D)
+            return SpatialGraphDiagram.yamada_polynomial(D, **kwargs)
+        D.yamada_polynomial = yamada_polynomial
+
+    assert sorted(yamada_polynomials(diagrams)) == list(enumerate(expected))
+    assert evaluated == diagrams[:2]
+
+    # Worker threads do not share the (not thread-safe) caches
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        many = [[theta_2_graph, omega_2_graph][i % 2]() for i in range(16)]
+        polys = dict(yamada_polynomials(many, executor=executor))
+        assert [polys[i] for i in range(16)] == [expected[i % 2] for i in range(16)]
+
+        caches = list(executor.map(lambda _: tuple(map(id, _worker_caches())), range(16)))
+        assert (id(yamada_polynomial_cache), id(H_poly_cache)) not in caches
+
+    raw = dict(yamada_polynomials(diagrams, normalized=False))
+    assert raw[0] == raw[2] == diagrams[0].yamada_polynomial(cache=None)
+
+
+def test_state_sum_yamada_polynomial():
+    for sgd in [theta_2_graph(), omega_2_graph()]:
+        timings = {}
+        assert yamada_state_sum(sgd, timings) == sgd.yamada_polynomial(cache=None)
+        assert timings['states'] == 3 ** len(sgd.crossings)
+        assert sgd.normalized_yamada_polynomial(engine='state_sum') == sgd.normalized_yamada_polynomial()
+
+
+def test_gray_code():
+    digits = [0, 0, 0]
+    visited = {tuple(digits)}
+    for position, digit in gray_code([3, 3, 2]):
+        assert abs(digits[position] - digit) == 1
+        digits[position] = digit
+        visited.add(tuple(digits))
+    assert len(visited) == 3 * 3 * 2
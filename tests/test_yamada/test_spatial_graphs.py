@@ -0,0 +1,134 @@
+"""Test the crossing detection of spatial graphs.
+
+
+"""
+
+import random
+import numpy as np
+from yamada import SpatialGraph
+from yamada.geometry import get_line_segment_intersection, get_line_segment_intersections
+
+
+def random_spatial_graph(num_nodes, seed=0):
+    rng = random.Random(seed)
+    nodes = ['n%d' % i for i in range(num_nodes)]
+    node_positions = {node: [rng.random(), rng.random(), rng.random()] for node in nodes}
+    edges = []
+    for i, node in enumerate(nodes[:-1]):
+        edges += [(node, other) for other in rng.sample(nodes[i + 1:], min(2, num_nodes - i - 1))]
+    np.random.seed(seed)
+    return SpatialGraph(nodes=nodes, node_positions=node_positions, edges=edges)
+
+
+def test_candidate_edge_pairs():
+    sg = random_spatial_graph(40)
+    candidates = sg._candidate_edge_pairs()
+    assert candidates == sorted(candidates)
+
+    # Every nonadjacent pair of edges that crosses is a candidate
+    crossing_pairs = []
+    for i, j in zip(*np.triu_indices(len(sg.edges), 1)):
+        (a, b), (c, d) = sg.edges[i], sg.edges[j]
+        if {a, b} & {c, d}:
+            continue
+        positions = [sg.node_positions_dict_2d[node] for node in (a, b, c, d)]
+        if get_line_segment_intersection(*positions)[0] < 0.0001:
+            crossing_pairs.append((i, j))
+    assert set(crossing_pairs) <= set(candidates)
+
+    # Crossings are numbered in the order of the nonadjacent edge pairs
+    assert len(sg.crossings) == len(crossing_pairs) > 0
+    for (i, j), (edge_1, edge_2) in zip(crossing_pairs, sg.crossing_edge_pairs):
+        assert {edge_1[0], edge_1[1], edge_2[0], edge_2[1]} == set(sg.edges[i]) | set(sg.edges[j])
+
+
+def test_line_segment_intersections():
+    rng = np.random.default_rng(0)
+    for k in [2, 3]:
+        a, b, c, d = rng.integers(-2, 3, (4, 200, k)).astype(float)
+
+        # Points, and parallel segments
+        b[:20] = a[:20]
+        d[10:30] = c[10:30]
+        c[40:60], d[40:60] = a[40:60] + 1, b[40:60] + 1
+
+        min_dists, positions = get_line_segment_intersections(a, b, c, d)
+        assert min_dists.shape == (200,) and positions.shape == (200, k)
+
+        for i in range(200):
+            min_dist, position = get_line_segment_intersection(a[i], b[i], c[i], d[i])
+            assert np.isclose(min_dists[i], min_dist, rtol=0, atol=1e-12)
+            assert np.allclose(positions[i], position, rtol=0, atol=1e-12)
+
+
+def test_index_maps():
+    sg = random_spatial_graph(30, seed=1)
+
+    for node, i in sg.node_indices.items():
+        assert sg.nodes[i] == node
+        incident_edges = sg.incident_edges[sg.incidence_offsets[i]:sg.incidence_offsets[i + 1]]
+        assert [sg.edges[k] for k in incident_edges] == [edge for edge in sg.edges if node in edge]
+        assert np.array_equal(sg.get_adjacent_nodes_projected_positions(node),
+                              [sg.node_positions_dict_2d[other] for other in sg.get_adjacent_nodes(node)])
+
+    for crossing, i in sg.crossing_indices.items():
+        assert sg.crossings[i] == crossing
+        for edge in sg.crossing_edge_pairs[i]:
+            assert i in sg.edge_crossing_indices[edge]
+
+
+def test_edge_pairs():
+    sg = random_spatial_graph(20, seed=2)
+
+    adjacent_edge_pairs = [(edge_1, edge_2) for edge_1, edge_2 in sg.edge_pairs if set(edge_1) & set(edge_2)]
+    assert sg.adjacent_edge_pairs == adjacent_edge_pairs
+    assert sg.nonadjacent_edge_pairs == [edge_pair for edge_pair in sg.edge_pairs
+                                         if edge_pair not in adjacent_edge_pairs]
+
+    for node in sg.nodes:
+        assert sg.node_degree(node) == len([edge for edge in sg.edges if node in edge])
+        assert sg.get_adjacent_nodes(node) == [edge[1 - edge.index(node)] for edge in sg.edges if node in edge]
+
+
+def test_update_positions():
+    sg = random_spatial_graph(10, seed=3)
+    diagram_code = sg.create_spatial_graph_diagram().canonical_code()
+
+    # A small move keeps the diagram
+    position = np.array(sg.node_positions_dict_3d['n4'])
+    assert not sg.update_positions(['n4'], [position + 1e-6])
+    assert sg.create_spatial_graph_diagram().canonical_code() == diagram_code
+
+    # The crossings agree with those of a new graph with the same projection
+    rng = np.random.default_rng(3)
+    for _ in range(5):
+        moved = ['n3', 'n7']
+        new_positions = [rng.random(3) for _ in moved]
+        changed = sg.update_positions(moved, new_positions)
+
+        node_positions = {node: sg.node_positions_dict_3d[node] for node in sg.nodes}
+        new_sg = SpatialGraph(nodes=sg.nodes, node_positions=node_positions, edges=sg.edges,
+                              projection_rotation=sg.projection_rotation)
+        assert np.array_equal(new_sg.projection_rotation, sg.projection_rotation)
+        assert new_sg.crossings == sg.crossings
+        assert new_sg.crossing_edge_pairs == sg.crossing_edge_pairs
+        assert new_sg.get_crossings()[2] == sg.get_crossings()[2]
+
+        new_diagram_code = new_sg.create_spatial_graph_diagram().canonical_code()
+        assert changed or new_diagram_code == diagram_code
+        diagram_code = new_diagram_code
+
+
+def test_get_crossings():
+    sg = random_spatial_graph(10, seed=3)
+    crossing_pairs = sg._find_crossings(sg._candidate_edge_pairs())
+
+    # The cached crossings are returned without testing the edge pairs again
+    sg._find_crossings = None
+    crossings, crossing_positions, crossing_edge_pairs = sg.get_crossings()
+    assert crossings == ['crossing_' + str(k) for k in range(len(crossing_pairs))]
+    assert np.allclose(crossing_positions, [position for position, _ in crossing_pairs.values()])
+    assert crossing_edge_pairs == [edge_pair for _, edge_pair in crossing_pairs.values()]
+
+    crossings_3D = sg.get_crossings_3D()
+    assert crossings_3D[0] == crossings and crossings_3D[3] == crossing_edge_pairs